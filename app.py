@@ -1,8 +1,22 @@
 import streamlit as st
-import google.generativeai as genai
 import os
-import json
+import time
 from audio_follow_up import audio_follow_up_component
+from challenge_verifier import VERIFIABLE_MODES, verify_quiz
+from chat_history import ChatHistoryManager, DEFAULT_HISTORY_TOKEN_BUDGET
+from chunked_review import CHUNKABLE_MODES, DEFAULT_TOKEN_BUDGET, group_sections, generate_chunked_review
+from client_pool import ModelClientPool
+from generation_scheduler import GenerationScheduler, estimate_request_tokens, is_rate_limit_error
+from library_store import DEFAULT_LIBRARY_DIR, LibraryStore, corpus_name, ensure_store, list_stores
+from metrics import MetricsRecorder, usage_tokens
+from prefetch import Prefetcher, make_prefetch_key
+from prompts import MODEL_NAME, PROMPT_TEMPLATES, DIFFICULTY_LEVELS, build_prompt
+from quiz_bank import load_quiz_bank, make_bank_key
+from quiz_cache import QuizCache, make_cache_key
+from quiz_view import parse_quiz_cached, render_quiz
+from response_streaming import stream_response_text, format_timing
+from search_index import DEFAULT_CONTEXT_TOKENS, SearchIndex
+from session_memory import SessionMemoryManager, current_session_id
 
 # --- 1. SETUP AND CONFIGURATION (USER-PROVIDED KEY MODEL) ---
 st.set_page_config(page_title="The Python Sage", page_icon="🐍", layout="wide")
@@ -26,222 +40,77 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_tutorial_data():
-    try:
-        with open('python_tutorial_library.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        st.error("Fatal Error: `python_tutorial_library.json` not found.")
-        st.info("Please make sure you have successfully run the `generate_tutorial_library.py` script first.")
-        return None
-library_data = load_tutorial_data()
-if library_data is None:
+TUTORIAL_LIBRARY_PATH = 'python_tutorial_library.json'
+TUTORIAL_CORPUS = corpus_name(TUTORIAL_LIBRARY_PATH)
+
+@st.cache_resource
+def get_corpora():
+    # The bundled JSON library is converted to an indexed store once (and again whenever it changes)
+    ensure_store(TUTORIAL_LIBRARY_PATH, DEFAULT_LIBRARY_DIR)
+    return list_stores(DEFAULT_LIBRARY_DIR)
+corpora = get_corpora()
+if not corpora:
+    st.error(f"Fatal Error: `{TUTORIAL_LIBRARY_PATH}` not found.")
+    st.info("Please build it first with `python ingest_tutorial.py path/to/cpython/Doc/tutorial`.")
     st.stop()
-topic_titles = [item['topic'] for item in library_data]
-
-
-# --- 2. THE PROMPT ENGINEERING TOOLKIT (The Major New Section) ---
-
-# We now have a dictionary of prompt templates for the different quiz modes.
-# You can add more prompts here just by adding a new key-value pair.
-PROMPT_TEMPLATES = {
-            "Complete Section Review": """
-        "You are The Python Sage, an exceptionally thorough and systematic tutor. You MUST adopt a tone appropriate for the user's selected knowledge level, as described in the difficulty instructions."
-        Your one and only task is to create a comprehensive, point-by-point review of the entire text provided. You must not leave out any concept or sub-topic.
-        Your difficulty instructions are: {difficulty_instructions}
-
-        **CONTEXT TO USE:**
-        ---
-        {content}
-        ---
-
-        **CRITICAL TASK & FORMATTING DIRECTIVES:**
-        1.  **Iterate Systematically:** Go through the `CONTEXT TO USE` from top to bottom. For EVERY distinct concept, function, or syntax example you find, you MUST generate a corresponding review point.
-        2.  **Do Not Summarize or Select:** Your goal is 100% coverage, not to pick the "most important" ideas. If the text mentions it, you must include it.
-        3.  **Writing Style:** Use clear, direct language. The definition should be brief and technical.
-        4.  Each review point MUST include a definition and a concise, illustrative code example.
-        5.  All code examples MUST be in a Markdown code block (```python ... ```).
-        6.  You MUST follow the output structure below for every single concept found.
-
-        **MANDATORY OUTPUT STRUCTURE:**
-
-        ### 1. [Name of the First Concept Found]
-        
-        **Definition:** [A clear, technical definition of the concept.]
-
-        **Example:**
-        ```python
-        # A concise code example demonstrating this specific concept.
-        ```
-
-        ---
-
-        ### 2. [Name of the Second Concept Found]
-
-        **Definition:** [A clear, technical definition of the concept.]
-
-        **Example:**
-        ```python
-        # A concise code example demonstrating this specific concept.
-        ```
 
-        ---
-
-        ### 3. [Name of the Third Concept Found]
-        
-        (Continue this exact pattern, creating a new numbered section for EVERY concept in the provided text until you have covered all of them.)
-    """,
-        "Concept-by-Concept Code Challenges": """
-        You are The Python Sage, an exceptionally thorough and systematic coding exercise designer.
-        Your one and only task is to generate a code challenge for EVERY distinct concept, function, or syntax example found in the provided text.
-        Your difficulty instructions are: {difficulty_instructions}
-
-        **CONTEXT TO USE:**
-        ---
-        {content}
-        ---
-
-        **CRITICAL TASK & FORMATTING DIRECTIVES:**
-        1.  **Systematic Coverage & Intelligent Grouping:** Go through the `CONTEXT TO USE` from top to bottom. Generate a code challenge for **each distinct concept or logical group of short, closely related concepts**. Your goal is 100% coverage of all challengeable concepts from the text, but avoid creating trivial challenges by combining where sensible.
-        2.  **Scoping Rule:** Each challenge and its solution MUST use only the concepts, functions, and syntax examples found directly in the CONTEXT TO USE. Avoid introducing more advanced topics.
-        3.  **Writing Style:** Keep all descriptions (Task, Input, Expected Output) concise and direct.
-        4.  You MUST provide a clear Input and the corresponding Expected Output for each challenge.
-        5.  All code (Input, Solution) and text output (Expected Output) MUST be in Markdown code blocks.
-        6.  You MUST follow the output structure below exactly, including numbering and spacing, for every single concept found.
-
-        **MANDATORY OUTPUT STRUCTURE:**
-
-        ### 1.[Name of the First Concept Found]
-
-        **Task:** [A clear and direct description of the goal related to this concept.]
-
-        **Input:**
-        ```python
-        # Example data related to the concept.
-        ```
-
-        **Expected Output:**
-        ```text
-        # The exact output of running the solution with the example input.
-        ```
-
-
-        **Solution:**
-        ```python
-        # The concise and correct code solution for this specific concept.
-        ```
-
-        ---
-
-        ### 2.[Name of the Second Concept Found]
-
-        **Task:** [A clear and direct description of the goal related to this concept.]
-
-        **Input:**
-        ```python
-        # Example data related to the concept.
-        ```
-
-        **Expected Output:**
-        ```text
-        # The exact output of running the solution with the example input.
-        ```
-
-
-        **Solution:**
-        ```python
-        # The concise and correct code solution for this specific concept.
-        ```
-
-        ---
-        (Continue this exact pattern, creating a new numbered section for EVERY concept in the provided text until you have covered all of them.)
-    """,
-    "1 Comprehensive Code Challenge": """
-        You are "The Python Sage," a master designer of intricate, multi-step coding puzzles and capstone challenges, modeling your output after professional coding platforms.
-        Your primary task is to generate 1 high-quality, comprehensive coding challenge based ONLY on the provided text. This challenge must intelligently weave together multiple, distinct concepts from the context.
-        Your difficulty instructions are: {difficulty_instructions}
-
-        **CONTEXT TO USE:**
-        ---
-        {content}
-        ---
-
-        **CRITICAL TASK & FORMATTING DIRECTIVES:**
-        1.  **Scoping Rule: The challenge and its solution MUST be solvable using only the concepts, functions, and syntax examples found directly in the CONTEXT TO USE. The goal is to weave together multiple concepts *from the provided text*, not to introduce new ones.**
-        2.  You MUST create a realistic **Scenario** and a clear **Task**.
-        3.  The task description MUST include an **Example Input** and the corresponding **Expected Output**.
-        4.  Both the Example Input and Expected Output MUST be in Markdown code blocks.
-        5.  The **Solution** section should ONLY contain the code that solves the problem and a detailed **Explanation**.
-        6.  You MUST follow the output structure below with no deviations.
-
-        **MANDATORY OUTPUT STRUCTURE:**
-
-        **[Create a Descriptive Title for the Challenge]**
-
-        **Scenario:**
-        [A 1-2 sentence story or context for the problem. e.g., "You are building a data processing pipeline for a university. You need to filter and format a list of student records."]
-
-        **Your Task:**
-        Write a function `process_records(records)` that takes a list of dictionaries and performs the following actions:
-        - It must use a list comprehension to filter for students with a GPA over 3.5.
-        - It must use the `map()` function to format the names of the selected students into "Last Name, First Name".
-        - Finally, it must return a list of the formatted names.
-
-        **Example Input:**
-        ```python
-        student_data = [
-            {{'first_name': 'John', 'last_name': 'Doe', 'gpa': 3.8}},
-            {{'first_name': 'Jane', 'last_name': 'Smith', 'gpa': 3.4}},
-            {{'first_name': 'Peter', 'last_name': 'Jones', 'gpa': 3.9}},
-        ]
-        ```
-
-        **Expected Output:**
-        ```text
-        ['Doe, John', 'Jones, Peter']
-        ```
-
-        **Hint:**
-        [A single, helpful sentence. e.g., "Remember that you can chain operations, feeding the output of one step into the input of the next."]
-
-        ---
-        
-        **Solution:**
-        ```python
-        # The complete, well-commented Python code for the solution goes here.
-        def process_records(records):
-            # Step 1: Filter students using a list comprehension
-            honor_roll = [rec for rec in records if rec['gpa'] > 3.5]
-            
-            # Step 2: Format names using map and a lambda function
-            formatted_names = map(lambda rec: f"{{rec['last_name']}}, {{rec['first_name']}}", honor_roll)
-            
-            # Step 3: Return the final list
-            return list(formatted_names)
+@st.cache_resource
+def get_section_index(store_path):
+    # Only the titles/offsets index is loaded; section text is read from the mapped store on demand.
+    return LibraryStore(store_path).section_index()
+
+@st.cache_resource
+def get_search_index(store_path):
+    # BM25 over every section's title and content, built the first time a corpus is searched.
+    # It keeps the nodes, not their text, which stays in the mapped store.
+    return SearchIndex(get_section_index(store_path).tree_order())
+
+@st.cache_resource
+def get_client_pool():
+    # Shared by every session; clients are keyed by a hash of each user's API key.
+    return ModelClientPool()
+client_pool = get_client_pool()
+
+@st.cache_resource
+def get_metrics_recorder():
+    # Process-wide: events from every session feed the same JSONL log and Prometheus file.
+    return MetricsRecorder()
+metrics_recorder = get_metrics_recorder()
+
+@st.cache_resource
+def get_generation_scheduler():
+    # Every session's model calls queue here, so limits apply to the whole server.
+    return GenerationScheduler(
+        max_concurrency=int(os.environ.get("PYTHON_SAGE_MAX_CONCURRENCY", 4)),
+        tokens_per_minute=int(os.environ.get("PYTHON_SAGE_TOKENS_PER_MINUTE", 1_000_000)),
+    )
+generation_scheduler = get_generation_scheduler()
 
-        # To test the solution with the example data:
-        # student_data = [ ... ] 
-        # print(process_records(student_data))
-        ```
+@st.cache_resource
+def get_session_memory():
+    # Process-wide, so the diagnostics can report every session's footprint.
+    return SessionMemoryManager(
+        byte_budget=int(float(os.environ.get("PYTHON_SAGE_SESSION_BUDGET_MB", 8)) * 1024 * 1024),
+    )
+session_memory = get_session_memory()
 
-        **Explanation:**
-        - **List Comprehension:** We used a list comprehension (`[rec for rec in records if rec['gpa'] > 3.5]`) to concisely filter the original list.
-        - **`map()` Function:** The `map()` function was used to apply a `lambda` function to each item of the `honor_roll` list.
-        - **`list()` Constructor:** We wrapped the `map` object in `list()` to convert the iterator into a concrete list for the return value.
+@st.cache_resource
+def get_prefetcher():
+    # A small, shared worker pool bounds speculative generation across all sessions.
+    return Prefetcher()
+prefetcher = get_prefetcher()
 
-        ---
-    """
-}
+@st.cache_resource
+def get_quiz_cache():
+    # One cache per server process; the SQLite file itself persists across restarts.
+    return QuizCache()
+quiz_cache = get_quiz_cache()
 
-# This dictionary holds the specific instructions for each difficulty level.
-DIFFICULTY_LEVELS = {
-    "Infant": "Assume the user is an 30 IQ baby. Focus on the most basic concepts and examples. Keep questions and challenges extremely simple.",
-    "Easy": "Assume the user is a beginner. Focus on the most fundamental concepts and examples. Keep questions and challenges straightforward and simple.",
-    "Intermediate": "Assume the user understands the basics. Ask questions that require combining one or two ideas. Code challenges can be slightly more complex.",
-    "Advanced": "Assume the user is comfortable with the topic. Ask nuanced questions that test deep knowledge of edge cases or interactions between concepts. Challenges can be more open-ended or complex.",
-    "PHD": "Assume the user is the best in the world at this topic. Ask nearly impossible questions that require deep understanding and synthesis of multiple advanced concepts. Challenges should be complex, multi-step problems that require creative solutions. Questions should be more difficult than the most advanced LeetCode problems"
-}
+@st.cache_resource
+def get_quiz_bank():
+    # Pre-built quizzes from build_quiz_bank.py; empty if the bank has not been generated.
+    return load_quiz_bank()
+quiz_bank = get_quiz_bank()
 
 
 # --- 3. THE UPGRADED USER INTERFACE ---
@@ -270,12 +139,47 @@ with st.sidebar.expander("How to get an API Key"):
 
 st.sidebar.header("Quiz Controls")
 
-# UI for selecting the topic (unchanged)
+def reset_topic():
+    # Topics belong to one corpus, so switching corpora starts the selection over.
+    for key in ("selected_topic", "topic_search"):
+        st.session_state.pop(key, None)
+
+# Several document sets can be hosted side by side; each is its own store
+if len(corpora) > 1:
+    selected_corpus = st.sidebar.selectbox(
+        "Library:",
+        options=list(corpora),
+        index=list(corpora).index(TUTORIAL_CORPUS) if TUTORIAL_CORPUS in corpora else 0,
+        format_func=lambda name: name.replace("_", " ").title(),
+        on_change=reset_topic,
+        key="selected_corpus"
+    )
+else:
+    selected_corpus = next(iter(corpora))
+corpus_path = corpora[selected_corpus]
+section_index = get_section_index(corpus_path)
+topic_titles = list(section_index.by_topic)
+
+def select_topic(topic):
+    # Runs before the rerun, so the selectbox below picks up the new value.
+    st.session_state.selected_topic = topic
+
+# Full-text search as a faster way into the topic list
+search_query = st.sidebar.text_input("🔎 Search the tutorial:", placeholder="e.g. list comprehensions", key="topic_search")
+if search_query:
+    search_start = time.perf_counter()
+    search_results = get_search_index(corpus_path).search(search_query, limit=5)
+    st.sidebar.caption(f"{len(search_results)} best match(es) in {(time.perf_counter() - search_start) * 1000:.1f} ms")
+    for i, (topic, _) in enumerate(search_results):
+        st.sidebar.button(topic, key=f"search_result_{i}", on_click=select_topic, args=(topic,))
+
+# UI for selecting the topic
 selected_topic = st.sidebar.selectbox(
     "1. Choose a topic:",
     options=topic_titles,
     index=None,
-    placeholder="Select a topic..."
+    placeholder="Select a topic...",
+    key="selected_topic"
 )
 
 # NEW: UI for selecting the Quiz Mode
@@ -297,58 +201,301 @@ comprehensive_mode = st.sidebar.checkbox(
     "4. Make it a Comprehensive Review",
     help="Check this box to include all sub-sections of the selected topic in the quiz."
 )
+if comprehensive_mode and selected_topic:
+    selected_node = section_index.get(selected_topic)
+    st.sidebar.caption(
+        f"Covers {len(selected_node.subtree_topics)} section(s), "
+        f"{selected_node.comprehensive_size / 1024:.1f} KB of source text."
+    )
+
+# Large comprehensive reviews can be generated as several smaller requests in parallel
+chunked_mode = st.sidebar.checkbox(
+    "Split large reviews into parallel parts",
+    value=True,
+    help="Generate big chapters as several concurrent requests and merge them in section order. "
+         "Only applies to the per-concept quiz modes.",
+    disabled=not comprehensive_mode
+)
+
+# Skip the quiz cache and ask the model for a fresh quiz
+regenerate_anyway = st.sidebar.checkbox(
+    "5. Regenerate anyway",
+    help="Ignore any cached quiz for this selection and generate a new one."
+)
+
+# Serve quizzes from the offline quiz bank when one exists for this selection
+use_prebuilt = st.sidebar.checkbox(
+    "Use a pre-built quiz when available",
+    value=bool(quiz_bank),
+    help="Instantly serve a quiz generated ahead of time by build_quiz_bank.py.",
+    # The bank is built from the bundled tutorial, and topic titles can repeat across corpora
+    disabled=not quiz_bank or selected_corpus != TUTORIAL_CORPUS
+)
+
+# Show answers as they are generated instead of waiting for the full reply
+stream_responses = st.sidebar.checkbox(
+    "Stream responses",
+    value=True,
+    help="Render the quiz and follow-up answers token-by-token as they arrive.",
+    key="stream_responses"
+)
+
+# How much earlier conversation each spoken follow-up resends to the model
+st.sidebar.number_input(
+    "Follow-up memory (tokens)",
+    min_value=1000,
+    max_value=100000,
+    value=DEFAULT_HISTORY_TOKEN_BUDGET,
+    step=1000,
+    help="Older follow-up questions are forgotten once the conversation, together with the tutorial "
+         "sections sent along with each question, grows past this size. The quiz itself is always kept.",
+    key="follow_up_token_budget"
+)
+
+# Start generating the selected quiz in the background before the button is pressed
+prefetch_enabled = st.sidebar.checkbox(
+    "Prepare my quiz in the background",
+    help="Starts generating the quiz for the current selection right away, so clicking "
+         "Generate returns almost instantly. Uses tokens for selections you may not generate."
+)
 
 # The generate button (unchanged)
 generate_button = st.sidebar.button("✨ Generate My Quiz!", type="primary", use_container_width=True)
 
+def uses_chunked_generation(topic, quiz_mode, comprehensive):
+    """Whether this selection is generated as parallel parts rather than a single request."""
+    return (
+        comprehensive and chunked_mode
+        and quiz_mode in CHUNKABLE_MODES
+        and len(group_sections(section_index.subtree(topic), DEFAULT_TOKEN_BUDGET)) > 1
+    )
+
+def prebuilt_quiz(topic, quiz_mode, difficulty, comprehensive):
+    """The quiz bank's quiz for this selection, or None if it won't be served from the bank."""
+    if not use_prebuilt or selected_corpus != TUTORIAL_CORPUS:
+        return None
+    # A comprehensive quiz of a leaf section is banked as the plain one
+    return quiz_bank.get(make_bank_key(
+        topic, quiz_mode, difficulty, comprehensive and bool(section_index.get(topic).children)
+    ))
+
+cache_stats = quiz_cache.stats()
+st.sidebar.caption(
+    f"Quiz cache: {cache_stats['entries']} quizzes · "
+    f"{cache_stats['hits']} hits / {cache_stats['misses']} misses"
+)
+
+# --- Speculative prefetch of the selected quiz ---
+if prefetch_enabled and api_key and selected_topic and not generate_button:
+    selection_key = make_prefetch_key(selected_corpus, selected_topic, selected_quiz_mode, selected_difficulty, comprehensive_mode)
+    current_job = st.session_state.get("prefetch_job")
+    if (current_job is None or current_job.key != selection_key) \
+            and selection_key != st.session_state.get("last_generated_key"):
+        # The selection changed: drop the stale job and start on the new one.
+        prefetcher.discard(st.session_state.pop("prefetch_job", None))
+        prefetch_content = section_index.content_for(selected_topic, comprehensive=comprehensive_mode)
+        if prefetch_content and not uses_chunked_generation(selected_topic, selected_quiz_mode, comprehensive_mode):
+            prefetch_prompt = build_prompt(selected_quiz_mode, selected_difficulty, prefetch_content)
+            # A selection the bank or the cache will serve costs nothing when clicked
+            if regenerate_anyway or not (
+                prebuilt_quiz(selected_topic, selected_quiz_mode, selected_difficulty, comprehensive_mode) is not None
+                or quiz_cache.contains(MODEL_NAME, prefetch_prompt)
+            ):
+                prefetch_model = client_pool.get_model(api_key)
+                job = prefetcher.submit(selection_key, prefetch_prompt, lambda: generation_scheduler.run(
+                    make_cache_key(MODEL_NAME, prefetch_prompt),
+                    lambda: prefetch_model.generate_content(prefetch_prompt),
+                    estimate_request_tokens(prefetch_prompt)
+                ))
+                if job is not None:
+                    st.session_state.prefetch_job = job
+elif not prefetch_enabled and "prefetch_job" in st.session_state:
+    prefetcher.discard(st.session_state.pop("prefetch_job"))
+
 # --- 4. THE DYNAMIC APPLICATION LOGIC (Two-Column Layout) ---
 
 # Define the columns at the top level
 main_col, follow_up_col = st.columns([1.25, 1]) # Main content is twice as wide as the follow-up
 
 # --- MAIN COLUMN: Quiz Generator and Content ---
+quiz_metrics = None
 with main_col:
     if generate_button and selected_topic:
         if not api_key:
             st.error("🛑 Please enter your Google API Key in the sidebar.")
         else:
+            quiz_metrics = {
+                "kind": "quiz",
+                "mode": selected_quiz_mode,
+                "difficulty": selected_difficulty,
+                "comprehensive": comprehensive_mode,
+                "retries": 0,
+            }
             try:
-                genai.configure(api_key=api_key)
-                model = genai.GenerativeModel('gemini-2.5-flash')
-                
-                # Store the chat session to maintain context
-                st.session_state.chat_session = model.start_chat()
-                
-                # Clear any previous follow-up response when generating a new quiz
-                if "follow_up_response" in st.session_state:
-                    del st.session_state.follow_up_response
+                model = client_pool.get_model(api_key)
                 
                 # Increment quiz count to reset the audio input widget
                 if 'quiz_count' not in st.session_state:
                     st.session_state.quiz_count = 0
                 st.session_state.quiz_count += 1
 
+                # Free the previous quiz's recordings, chat session and follow-up state
+                session_memory.start_quiz(st.session_state, st.session_state.quiz_count)
+
                 # --- Content Gathering and Prompting ---
-                content_for_ai = ""
-                if not comprehensive_mode:
-                    item = next((item for item in library_data if item['topic'] == selected_topic), None)
-                    if item: content_for_ai = item['content']
-                else:
-                    base_num = selected_topic.split(' ')[0]
-                    items = [item for item in library_data if item['topic'].startswith(base_num)]
-                    content_for_ai = "\n---\n".join([i['content'] for i in items])
+                content_start = time.perf_counter()
+                content_for_ai = section_index.content_for(selected_topic, comprehensive=comprehensive_mode)
                 
                 if content_for_ai:
-                    final_prompt = PROMPT_TEMPLATES[selected_quiz_mode].format(
-                        difficulty_instructions=DIFFICULTY_LEVELS[selected_difficulty],
-                        content=content_for_ai
+                    final_prompt = build_prompt(selected_quiz_mode, selected_difficulty, content_for_ai)
+                    quiz_metrics["content_ms"] = (time.perf_counter() - content_start) * 1000
+                    quiz_metrics["prompt_chars"] = len(final_prompt)
+                    use_chunked = uses_chunked_generation(selected_topic, selected_quiz_mode, comprehensive_mode)
+                    # Chunked answers differ from single-shot ones, so they are cached separately
+                    cache_model_name = f"{MODEL_NAME}:chunked" if use_chunked else MODEL_NAME
+                    cached_response = None
+                    if not regenerate_anyway:
+                        cached_response = prebuilt_quiz(selected_topic, selected_quiz_mode, selected_difficulty, comprehensive_mode)
+                        quiz_metrics["source"] = "bank"
+                        if cached_response is None:
+                            cached_response = quiz_cache.get(cache_model_name, final_prompt)
+                            quiz_metrics["source"] = "cache"
+                    selection_key = make_prefetch_key(
+                        selected_corpus, selected_topic, selected_quiz_mode, selected_difficulty, comprehensive_mode
                     )
-                    with st.spinner(f"The Sage is crafting your quiz..."):
-                        response = st.session_state.chat_session.send_message(final_prompt)
+                    st.session_state.last_generated_key = selection_key
+                    prefetched = None
+                    if cached_response is None and prefetch_enabled and not use_chunked:
+                        claim_start = time.perf_counter()
+                        with st.spinner("The Sage is finishing your quiz..."):
+                            prefetched = prefetcher.claim(st.session_state.pop("prefetch_job", None), selection_key)
+                        claim_seconds = time.perf_counter() - claim_start
+
+                    if cached_response is not None:
+                        # A prefetch started before the quiz was banked or cached was not needed
+                        prefetcher.discard(st.session_state.pop("prefetch_job", None))
+                        # Seed the chat with the cached exchange so follow-ups keep their context
+                        st.session_state.chat_session = model.start_chat(history=[
+                            {"role": "user", "parts": [final_prompt]},
+                            {"role": "model", "parts": [cached_response]},
+                        ])
+                        st.session_state.last_quiz_response = cached_response
+                        st.session_state.last_quiz_timing = None
+                    elif prefetched is not None:
+                        # Generated in the background while the user was still choosing
+                        st.session_state.chat_session = model.start_chat(history=[
+                            {"role": "user", "parts": [final_prompt]},
+                            {"role": "model", "parts": [prefetched["text"]]},
+                        ])
+                        st.session_state.last_quiz_response = prefetched["text"]
+                        st.session_state.last_quiz_timing = {"total": claim_seconds}
+                        quiz_cache.put(MODEL_NAME, final_prompt, prefetched["text"])
+                        quiz_metrics.update(
+                            source="prefetch",
+                            total_s=claim_seconds,
+                            ttfb_s=claim_seconds,
+                            prompt_tokens=prefetched["prompt_tokens"],
+                            response_tokens=prefetched["response_tokens"],
+                        )
+                    elif use_chunked:
+                        quiz_metrics["source"] = "chunked"
+                        with st.spinner(f"The Sage is crafting your review in parallel parts..."):
+                            start = time.perf_counter()
+                            review_text = generate_chunked_review(
+                                model, section_index.subtree(selected_topic),
+                                selected_quiz_mode, selected_difficulty, usage=quiz_metrics,
+                                generate=lambda part_prompt: generation_scheduler.run(
+                                    make_cache_key(MODEL_NAME, part_prompt),
+                                    lambda: model.generate_content(part_prompt),
+                                    estimate_request_tokens(part_prompt)
+                                )[0]
+                            )
+                            timing = {"total": time.perf_counter() - start}
+                        quiz_metrics["ttfb_s"] = quiz_metrics["total_s"] = timing["total"]
+                        # The parts were generated outside the chat, so seed it with the merged review
+                        st.session_state.chat_session = model.start_chat(history=[
+                            {"role": "user", "parts": [final_prompt]},
+                            {"role": "model", "parts": [review_text]},
+                        ])
+                        st.session_state.last_quiz_response = review_text
+                        st.session_state.last_quiz_timing = timing
+                        quiz_cache.put(cache_model_name, final_prompt, review_text)
+                    else:
+                        timing = {}
+                        queue_note = st.empty()
+                        queue_depth = generation_scheduler.queue_depth()
+                        if queue_depth:
+                            queue_note.caption(f"⏳ {queue_depth} request(s) ahead of you in the queue...")
+                        start = time.perf_counter()
+                        if stream_responses:
+                            # Render chunks as they arrive, then hand over to the regular display below
+                            stream_area = st.empty()
+                            def generate_quiz():
+                                queue_note.empty()
+                                with stream_area.container():
+                                    call_start = time.perf_counter()
+                                    streamed = model.generate_content(final_prompt, stream=True)
+                                    st.write_stream(stream_response_text(streamed, timing, call_start))
+                                return streamed
+                            response, ticket = generation_scheduler.run(
+                                make_cache_key(MODEL_NAME, final_prompt), generate_quiz,
+                                estimate_request_tokens(final_prompt)
+                            )
+                            stream_area.empty()
+                        else:
+                            with st.spinner(f"The Sage is crafting your quiz..."):
+                                response, ticket = generation_scheduler.run(
+                                    make_cache_key(MODEL_NAME, final_prompt),
+                                    lambda: model.generate_content(final_prompt),
+                                    estimate_request_tokens(final_prompt)
+                                )
+                        queue_note.empty()
+                        timing["total"] = time.perf_counter() - start
+                        # Store the chat session to maintain context
+                        st.session_state.chat_session = model.start_chat(history=[
+                            {"role": "user", "parts": [final_prompt]},
+                            {"role": "model", "parts": [response.text]},
+                        ])
                         st.session_state.last_quiz_response = response.text # Store the quiz text
+                        st.session_state.last_quiz_timing = timing
+                        quiz_cache.put(MODEL_NAME, final_prompt, response.text)
+                        quiz_metrics["source"] = "coalesced" if ticket["coalesced"] else "model"
+                        quiz_metrics["queue_s"] = ticket["queue_s"]
+                        quiz_metrics["retries"] = ticket["retries"]
+                        quiz_metrics["total_s"] = timing["total"]
+                        quiz_metrics["ttfb_s"] = timing.get("ttft") or timing["total"]
+                        if ticket["coalesced"]:
+                            # The leader's request already recorded what this quiz cost
+                            quiz_metrics["prompt_tokens"] = quiz_metrics["response_tokens"] = 0
+                        else:
+                            quiz_metrics["prompt_tokens"], quiz_metrics["response_tokens"] = usage_tokens(response)
+
+                    # Follow-ups only need the rendered quiz, not the long template instructions
+                    history_manager = ChatHistoryManager(st.session_state.follow_up_token_budget)
+                    history_manager.seed(st.session_state.chat_session, selected_topic, selected_quiz_mode)
+                    st.session_state.follow_up_token_log = []
+                    # Spoken questions can't be searched before the model hears them, so the
+                    # grounding for follow-ups is retrieved once, from what the quiz covers.
+                    # It shares the follow-up budget with the quiz, so it only fills the room left.
+                    context_budget = min(
+                        DEFAULT_CONTEXT_TOKENS,
+                        history_manager.token_budget - history_manager.count_tokens(st.session_state.chat_session.history)
+                    )
+                    st.session_state.follow_up_context = ""
+                    if context_budget > 0:
+                        quiz_headings = " ".join(
+                            section["title"] for section in parse_quiz_cached(st.session_state.last_quiz_response)["sections"]
+                        )
+                        st.session_state.follow_up_context = get_search_index(corpus_path).context_for(
+                            f"{selected_topic} {quiz_headings}", token_budget=context_budget
+                        )
                 
             except Exception as e:
-                st.error(f"An error occurred: {e}")
+                if is_rate_limit_error(e):
+                    st.warning("⏳ The Sage is very busy right now (the model's rate limit was reached). Please try again in a minute.")
+                else:
+                    st.error(f"An error occurred: {e}")
+                quiz_metrics["error"] = str(e)
 
     elif generate_button and not selected_topic:
         st.warning("Please select a topic from the dropdown menu first.")
@@ -356,7 +503,26 @@ with main_col:
     # --- Display Quiz Content or Welcome Message ---
     if "last_quiz_response" in st.session_state:
         st.header(f"{selected_quiz_mode}: {selected_topic}", divider="rainbow")
-        st.markdown(st.session_state.last_quiz_response)
+        if st.session_state.get("last_quiz_timing"):
+            st.caption(format_timing(st.session_state.last_quiz_timing))
+        quiz_id = st.session_state.get('quiz_count', 0)
+        if selected_quiz_mode in VERIFIABLE_MODES and st.button("🧪 Verify solutions", help="Runs each solution in a sandboxed Python process and checks it against the expected output."):
+            with st.spinner("Running the solutions..."):
+                st.session_state.quiz_verification = {
+                    "quiz_id": quiz_id,
+                    "results": verify_quiz(st.session_state.last_quiz_response),
+                }
+            if not st.session_state.quiz_verification["results"]:
+                st.info("No runnable solutions with an expected output were found in this quiz.")
+        verification = st.session_state.get("quiz_verification", {})
+        render_start = time.perf_counter()
+        render_quiz(
+            st.session_state.last_quiz_response,
+            view_key=f"quiz_view_{quiz_id}",
+            verification=verification.get("results") if verification.get("quiz_id") == quiz_id else None,
+        )
+        if quiz_metrics is not None:
+            quiz_metrics["render_ms"] = (time.perf_counter() - render_start) * 1000
     else:
         if not api_key:
             st.info("👋 Welcome! Please enter your Google API Key in the sidebar to get started.")
@@ -375,14 +541,29 @@ with main_col:
 with follow_up_col:
 
     # This remains at the end to render the sidebar controls
-    audio_follow_up_component()
+    audio_follow_up_component(metrics_recorder, generation_scheduler)
 
     # We now create the container unconditionally.
     with st.container(border=True):
         # Use an if/else to decide what content to show inside the container.
         if "follow_up_response" in st.session_state and st.session_state.follow_up_response:
             # If we have a response, show it.
+            if st.session_state.get("follow_up_timing"):
+                st.caption(format_timing(st.session_state.follow_up_timing))
             st.markdown(st.session_state.follow_up_response)
+            audio_stats = st.session_state.get("last_audio_stats")
+            if audio_stats:
+                st.caption(
+                    f"Question audio: {audio_stats['bytes_in'] / 1024:.0f} KB recorded → "
+                    f"{audio_stats['bytes_out'] / 1024:.0f} KB uploaded ({audio_stats['mime_type'].split('/')[-1].upper()}) · "
+                    f"processed in {audio_stats['ms']:.0f} ms"
+                )
+            if st.session_state.get("follow_up_token_log"):
+                last_turn = st.session_state.follow_up_token_log[-1]
+                st.caption(
+                    f"Prompt tokens this question: {last_turn['prompt_tokens'] or 'n/a'} · "
+                    f"history kept for the next one: ~{last_turn['history_tokens']} tokens"
+                )
             if st.button("Clear Answer"):
                 del st.session_state.follow_up_response
                 st.rerun()
@@ -401,3 +582,45 @@ with follow_up_col:
         "https://www.buymeacoffee.com/DawsonSallee", 
         use_container_width=True
     )
+
+# --- DIAGNOSTICS: request/latency metrics for operators ---
+if quiz_metrics is not None:
+    metrics_recorder.record(**quiz_metrics)
+
+# Keep this session within its memory budget now that the run's work is done
+session_memory_report = session_memory.enforce(st.session_state, current_session_id())
+
+if st.sidebar.checkbox("Show diagnostics", help="Latency, token and error metrics for this server."):
+    with st.sidebar.expander("Diagnostics", expanded=True):
+        summary = metrics_recorder.summary()
+        if summary:
+            st.dataframe(summary, hide_index=True)
+            st.caption("Last request")
+            st.json(metrics_recorder.events[-1], expanded=False)
+        else:
+            st.caption("No requests recorded yet.")
+        scheduler_stats = generation_scheduler.stats()
+        st.caption(
+            f"Generation queue: {scheduler_stats['waiting']} waiting · {scheduler_stats['running']} running · "
+            f"avg wait {scheduler_stats['avg_wait_s']:.1f}s · {scheduler_stats['coalesced']} coalesced · "
+            f"{scheduler_stats['rate_limited']} rate-limit retries"
+        )
+        prefetch_stats = prefetcher.stats()
+        if prefetch_stats["submitted"]:
+            hit_rate = prefetch_stats["hit_rate"]
+            st.caption(
+                f"Prefetch: {prefetch_stats['hits']} hits / {prefetch_stats['misses']} misses"
+                + (f" ({hit_rate:.0%})" if hit_rate is not None else "")
+                + f" · {prefetch_stats['pending']} running · {prefetch_stats['cancelled']} cancelled · "
+                f"{prefetch_stats['wasted_tokens']} wasted tokens"
+            )
+        memory_stats = session_memory.stats()
+        st.caption(
+            f"Session state: {session_memory_report['bytes'] / 1024:.0f} KB here · "
+            f"{memory_stats['total_bytes'] / 1024 / 1024:.1f} MB across {memory_stats['sessions']} session(s) · "
+            f"{memory_stats['evictions']} evictions (budget {session_memory.byte_budget / 1024 / 1024:.0f} MB per session)"
+        )
+        st.caption(
+            f"Also written to `{metrics_recorder.jsonl_path}` (JSON lines) and "
+            f"`{metrics_recorder.prom_path}` (Prometheus text format)."
+        )
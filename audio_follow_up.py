@@ -4,19 +4,40 @@ import streamlit as st
 import google.generativeai as genai
 import io
 import time
+from audio_preprocessing import preprocess_audio
+from chat_history import ChatHistoryManager, DEFAULT_HISTORY_TOKEN_BUDGET
+from generation_scheduler import RESPONSE_TOKEN_ALLOWANCE
+from metrics import usage_tokens
+from prompts import estimate_tokens
+from response_streaming import stream_response_text
+from session_memory import RECORDER_RESETS_KEY
+
+# Gemini bills audio input at about 32 tokens per second.
+AUDIO_TOKENS_PER_SECOND = 32
+
+def recorder_key():
+    """The audio widget's key. A new key gives an empty recorder and frees the old recording."""
+    key = f"audio_recorder_{st.session_state.get('quiz_count', 0)}"
+    resets = st.session_state.get(RECORDER_RESETS_KEY, 0)
+    return f"{key}_{resets}" if resets else key
 
 # --- This is the new, simple callback function. It is FAST. ---
-def set_process_audio_flag():
+def set_process_audio_flag(audio_key):
     """
     This callback's ONLY job is to set a flag in session_state, indicating
-    that there is new audio data ready to be processed.
+    that there is new audio data ready to be processed. The widget's own key is
+    passed in, since the recorder may have been given a new key since it rendered.
     """
-    audio_key = f"audio_recorder_{st.session_state.get('quiz_count', 0)}"
     if st.session_state[audio_key] is not None:
         st.session_state.process_audio_flag = True
+        st.session_state.process_audio_key = audio_key
 
-def audio_follow_up_component():
-    """Renders the audio input and handles the processing flow via a state flag."""
+def audio_follow_up_component(metrics_recorder=None, generation_scheduler=None):
+    """
+    Renders the audio input and handles the processing flow via a state flag.
+    If a MetricsRecorder is given, each follow-up is recorded with it; if a
+    GenerationScheduler is given, the model call queues behind its limits.
+    """
 
     # Initialize the flag if it doesn't exist
     if "process_audio_flag" not in st.session_state:
@@ -26,12 +47,13 @@ def audio_follow_up_component():
     st.subheader("🗣️ Ask a Follow-up") # Using subheader is better for a column
     
     if "chat_session" in st.session_state:
-        audio_key = f"audio_recorder_{st.session_state.get('quiz_count', 0)}"
+        audio_key = recorder_key()
         
         st.audio_input( # <-- NO .sidebar
             "Record a question about the content to send to Gemini:",
             key=audio_key,
-            on_change=set_process_audio_flag
+            on_change=set_process_audio_flag,
+            args=(audio_key,)
         )
     else:
         st.caption("Generate a quiz to enable follow-up questions.") # <-- NO .sidebar
@@ -42,13 +64,19 @@ def audio_follow_up_component():
         
         api_key = st.session_state.get("api_key")
         chat_session = st.session_state.get("chat_session")
-        audio_bytes_data = st.session_state.get(f"audio_recorder_{st.session_state.get('quiz_count', 0)}")
+        audio_bytes_data = st.session_state.get(st.session_state.get("process_audio_key", recorder_key()))
 
         if api_key and chat_session and audio_bytes_data:
+            stream_responses = st.session_state.get("stream_responses", False)
+            follow_up_metrics = {"kind": "follow_up", "retries": 0}
             with st.spinner("The Sage is thinking..."):
                 try:
                     raw_audio_bytes = audio_bytes_data.getvalue()
-                    audio_part = {"mime_type": "audio/wav", "data": raw_audio_bytes}
+                    # Mono, 16 kHz, silence-trimmed (and FLAC when available) uploads far faster
+                    audio_data, mime_type, audio_stats = preprocess_audio(raw_audio_bytes)
+                    st.session_state.last_audio_stats = audio_stats
+                    audio_part = {"mime_type": mime_type, "data": audio_data}
+                    follow_up_metrics["audio_bytes"] = len(audio_data)
                     
                     follow_up_prompt = [
                         "You are an expert Python tutor. A user is asking a follow-up question about the previous quiz content. "
@@ -57,11 +85,66 @@ def audio_follow_up_component():
                         "Keep your entire response under 150 words.",
                         audio_part
                     ]
+                    follow_up_context = st.session_state.get("follow_up_context")
+                    if follow_up_context:
+                        # Only the best-matching tutorial sections; compaction drops them with the audio
+                        follow_up_prompt.insert(1, f"Relevant sections of the Python tutorial:\n{follow_up_context}")
                     
-                    response = chat_session.send_message(follow_up_prompt)
+                    timing = {}
+                    def send_follow_up():
+                        if stream_responses:
+                            call_start = time.perf_counter()
+                            streamed = chat_session.send_message(follow_up_prompt, stream=True)
+                            st.write_stream(stream_response_text(streamed, timing, call_start))
+                            return streamed
+                        return chat_session.send_message(follow_up_prompt)
+
+                    # The instructions and retrieved sections are resent with every question, so
+                    # they count against the budget and the history kept is smaller by as much
+                    text_tokens = sum(estimate_tokens(part) for part in follow_up_prompt if isinstance(part, str))
+                    token_budget = st.session_state.get("follow_up_token_budget", DEFAULT_HISTORY_TOKEN_BUDGET)
+                    history_manager = ChatHistoryManager(max(0, token_budget - text_tokens))
+                    audio_tokens = int((audio_stats["seconds"] or 0) * AUDIO_TOKENS_PER_SECOND)
+                    start = time.perf_counter()
+                    if generation_scheduler is not None:
+                        # Spoken questions are never identical, so they queue but are not coalesced
+                        response, ticket = generation_scheduler.run(
+                            None, send_follow_up,
+                            history_manager.count_tokens(chat_session.history) + text_tokens + audio_tokens
+                            + RESPONSE_TOKEN_ALLOWANCE
+                        )
+                        follow_up_metrics["queue_s"] = ticket["queue_s"]
+                        follow_up_metrics["retries"] = ticket["retries"]
+                    else:
+                        response = send_follow_up()
+                    timing["total"] = time.perf_counter() - start
                     st.session_state.follow_up_response = response.text
+                    st.session_state.follow_up_timing = timing
+
+                    # Keep the history that the next question will resend within budget
+                    history_manager.compact(chat_session)
+                    prompt_tokens, response_tokens = usage_tokens(response)
+                    st.session_state.setdefault("follow_up_token_log", []).append({
+                        "prompt_tokens": prompt_tokens,
+                        "history_tokens": history_manager.count_tokens(chat_session.history),
+                    })
+                    follow_up_metrics.update(
+                        prompt_tokens=prompt_tokens,
+                        response_tokens=response_tokens,
+                        total_s=timing["total"],
+                        ttfb_s=timing.get("ttft") or timing["total"],
+                    )
 
                 except Exception as e:
+                    if getattr(chat_session, "last", None) is not None:
+                        # A reply that stopped abnormally (safety, recitation, dropped stream)
+                        # leaves the chat unusable until its unfinished exchange is removed.
+                        chat_session.rewind()
                     st.session_state.follow_up_response = f"**An error occurred:**\n```\n{e}\n```"
+                    st.session_state.follow_up_timing = None
+                    follow_up_metrics["error"] = str(e)
+
+            if metrics_recorder is not None:
+                metrics_recorder.record(**follow_up_metrics)
             
             st.rerun()
\ No newline at end of file
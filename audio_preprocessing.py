@@ -0,0 +1,145 @@
+# audio_preprocessing.py
+
+import io
+import logging
+import time
+import wave
+
+import numpy as np
+
+try:
+    import soundfile
+except ImportError:  # Optional: without it the processed audio is sent as a 16-bit WAV.
+    soundfile = None
+
+logger = logging.getLogger(__name__)
+
+SPEECH_SAMPLE_RATE = 16000
+SILENCE_THRESHOLD_DB = -40.0
+FRAME_MS = 20
+PADDING_MS = 200
+# Shorter clips are not worth processing (and an empty one would encode to an empty file).
+MIN_AUDIO_MS = 100
+
+
+def _decode_wav(wav_bytes):
+    """Decodes PCM WAV bytes to a float32 array of shape (frames, channels) and its sample rate."""
+    with wave.open(io.BytesIO(wav_bytes), "rb") as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        bytes_ = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = bytes_[:, 0] | (bytes_[:, 1] << 8) | (bytes_[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width: {width} bytes")
+    return samples.reshape(-1, channels), rate
+
+
+def _resample(samples, rate, target_rate):
+    """Linear-interpolation resampling, after a box filter to limit aliasing when downsampling."""
+    if rate <= target_rate or len(samples) == 0:
+        return samples, rate
+    factor = rate / target_rate
+    width = int(round(factor))
+    if width > 1:
+        samples = np.convolve(samples, np.full(width, 1.0 / width, dtype=np.float32), mode="same")
+    n_out = int(len(samples) / factor)
+    positions = np.arange(n_out, dtype=np.float64) * factor
+    resampled = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return resampled, target_rate
+
+
+def _trim_silence(samples, rate, threshold_db=SILENCE_THRESHOLD_DB, frame_ms=FRAME_MS, padding_ms=PADDING_MS):
+    """Drops leading and trailing frames quieter than `threshold_db` relative to the loudest frame."""
+    frame_len = max(1, int(rate * frame_ms / 1000))
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return samples
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    peak = rms.max()
+    if peak <= 0:
+        return samples
+    loud = np.flatnonzero(20 * np.log10(np.maximum(rms, 1e-10) / peak) > threshold_db)
+    if len(loud) == 0:
+        return samples
+    padding = int(rate * padding_ms / 1000)
+    start = max(0, loud[0] * frame_len - padding)
+    end = min(len(samples), (loud[-1] + 1) * frame_len + padding)
+    return samples[start:end]
+
+
+def _encode(samples, rate, compress):
+    if compress and soundfile is not None:
+        buffer = io.BytesIO()
+        soundfile.write(buffer, samples, rate, format="FLAC", subtype="PCM_16")
+        return buffer.getvalue(), "audio/flac"
+
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue(), "audio/wav"
+
+
+def _passthrough(wav_bytes, start, seconds=None):
+    stats = {
+        "bytes_in": len(wav_bytes),
+        "bytes_out": len(wav_bytes),
+        "seconds": seconds,
+        "mime_type": "audio/wav",
+        "ms": (time.perf_counter() - start) * 1000,
+    }
+    return wav_bytes, "audio/wav", stats
+
+
+def preprocess_audio(wav_bytes, target_rate=SPEECH_SAMPLE_RATE, compress=True):
+    """
+    Shrinks a recorded question before it is uploaded: downmixes to mono,
+    resamples to a speech rate, trims leading/trailing silence and, when
+    `soundfile` is installed, encodes to FLAC.
+
+    Returns (audio_bytes, mime_type, stats). Audio that cannot be decoded, or
+    that is shorter than MIN_AUDIO_MS, is passed through unchanged.
+    """
+    start = time.perf_counter()
+    try:
+        samples, rate = _decode_wav(wav_bytes)
+    except (wave.Error, EOFError, ValueError) as e:
+        logger.warning("Audio preprocessing skipped, could not decode WAV: %s", e)
+        return _passthrough(wav_bytes, start)
+
+    duration = len(samples) / rate
+    mono = samples.mean(axis=1)
+    mono, rate = _resample(mono, rate, target_rate)
+    mono = _trim_silence(mono, rate)
+    if len(mono) < rate * MIN_AUDIO_MS / 1000:
+        return _passthrough(wav_bytes, start, duration)
+    audio_bytes, mime_type = _encode(mono, rate, compress)
+
+    stats = {
+        "bytes_in": len(wav_bytes),
+        "bytes_out": len(audio_bytes),
+        "seconds": len(mono) / rate,
+        "mime_type": mime_type,
+        "ms": (time.perf_counter() - start) * 1000,
+    }
+    logger.info(
+        "Audio preprocessed: %d -> %d bytes (%s, %d Hz, %.2fs) in %.1f ms",
+        stats["bytes_in"], stats["bytes_out"], mime_type, rate, stats["seconds"], stats["ms"],
+    )
+    return audio_bytes, mime_type, stats
@@ -0,0 +1,169 @@
+# build_quiz_bank.py
+"""
+Pre-generates quizzes for every topic / quiz mode / difficulty combination
+(or a chosen slice of it) and stores them in a quiz bank that app.py can serve
+instantly.
+
+Examples:
+    python build_quiz_bank.py --api-key $GOOGLE_API_KEY --rpm 10
+    python build_quiz_bank.py --sections 4 5.1 --modes "Complete Section Review" --difficulties Easy
+    python build_quiz_bank.py --fake --output /tmp/fake_bank.jsonl.gz
+
+Runs are resumable: combinations already in the output file are skipped.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+from library_index import SectionIndex, parse_section_path
+from prompts import MODEL_NAME, PROMPT_TEMPLATES, DIFFICULTY_LEVELS, build_prompt
+from quiz_bank import DEFAULT_BANK_PATH, append_entry, make_bank_key, read_quiz_bank, repair_bank
+
+
+class RateLimiter:
+    """Spaces request starts evenly so no more than `rpm` begin in any minute."""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def plan_jobs(section_index, sections, modes, difficulties, comprehensive):
+    """Lists the (topic, mode, difficulty, comprehensive) combinations to generate."""
+    prefixes = [parse_section_path(s) for s in sections] if sections else None
+    jobs = []
+    for topic, node in section_index.by_topic.items():
+        if prefixes is not None and not any(
+            node.path is not None and node.path[:len(p)] == p for p in prefixes
+        ):
+            continue
+        flags = {"no": [False], "yes": [True], "both": [False, True]}[comprehensive]
+        for flag in flags:
+            # A comprehensive quiz of a leaf section is identical to the plain one.
+            if flag and not node.children:
+                continue
+            content = section_index.content_for(topic, comprehensive=flag)
+            if not content:
+                continue
+            for mode in modes:
+                for difficulty in difficulties:
+                    jobs.append((topic, mode, difficulty, flag))
+    return jobs
+
+
+async def generate_with_retry(model, prompt, limiter, max_retries, base_delay):
+    for attempt in range(max_retries + 1):
+        await limiter.wait()
+        try:
+            response = await model.generate_content_async(prompt)
+            return response.text
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = base_delay * (2 ** attempt) * (1 + random.random())
+            print(f"  retry {attempt + 1}/{max_retries} in {delay:.1f}s: {e}", file=sys.stderr)
+            await asyncio.sleep(delay)
+
+
+async def build_bank(model, section_index, jobs, output, concurrency=4, rpm=0,
+                     max_retries=3, base_delay=2.0):
+    """Generates every job not already in `output`, appending results as they finish."""
+    bank, truncated = read_quiz_bank(output)
+    if truncated:
+        repair_bank(output, bank)
+        print(f"Recovered {len(bank)} quizzes from a bank cut off by an interrupted run.")
+    done = set(bank)
+    pending = [job for job in jobs if make_bank_key(*job) not in done]
+    print(f"{len(jobs) - len(pending)} already in bank, {len(pending)} to generate.")
+
+    limiter = RateLimiter(rpm)
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"done": 0, "failed": 0}
+
+    async def run(job):
+        topic, mode, difficulty, comprehensive = job
+        prompt = build_prompt(mode, difficulty, section_index.content_for(topic, comprehensive))
+        async with semaphore:
+            try:
+                text = await generate_with_retry(model, prompt, limiter, max_retries, base_delay)
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"FAILED {make_bank_key(*job)}: {e}", file=sys.stderr)
+                return
+        # Written from the event loop thread, one entry at a time.
+        append_entry(output, topic, mode, difficulty, comprehensive, text)
+        stats["done"] += 1
+        print(f"[{stats['done']}/{len(pending)}] {make_bank_key(*job)}")
+
+    await asyncio.gather(*(run(job) for job in pending))
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate a quiz bank for The Python Sage.")
+    parser.add_argument("--library", default="python_tutorial_library.json")
+    parser.add_argument("--output", default=DEFAULT_BANK_PATH)
+    parser.add_argument("--sections", nargs="*", help="Section numbers to include, e.g. 4 5.1 (default: all).")
+    parser.add_argument("--modes", nargs="*", default=list(PROMPT_TEMPLATES), choices=list(PROMPT_TEMPLATES))
+    parser.add_argument("--difficulties", nargs="*", default=list(DIFFICULTY_LEVELS), choices=list(DIFFICULTY_LEVELS))
+    parser.add_argument("--comprehensive", choices=["no", "yes", "both"], default="no")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=10, help="Maximum requests started per minute (0 = unlimited).")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"))
+    parser.add_argument("--fake", action="store_true", help="Use the local fake model instead of Gemini.")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the combinations that would be generated.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with open(args.library, "r", encoding="utf-8") as f:
+        section_index = SectionIndex(json.load(f))
+
+    jobs = plan_jobs(section_index, args.sections, args.modes, args.difficulties, args.comprehensive)
+    if args.dry_run:
+        for job in jobs:
+            print(make_bank_key(*job))
+        print(f"{len(jobs)} combinations.")
+        return 0
+
+    if args.fake:
+        from fake_model import FakeModelClient
+        model = FakeModelClient()
+    else:
+        if not args.api_key:
+            print("An API key is required (--api-key or GOOGLE_API_KEY), or use --fake.", file=sys.stderr)
+            return 2
+        import google.generativeai as genai
+        genai.configure(api_key=args.api_key)
+        model = genai.GenerativeModel(args.model)
+
+    start = time.perf_counter()
+    stats = asyncio.run(build_bank(
+        model, section_index, jobs, args.output,
+        concurrency=args.concurrency, rpm=args.rpm, max_retries=args.max_retries,
+    ))
+    print(f"Generated {stats['done']} quizzes ({stats['failed']} failed) in {time.perf_counter() - start:.1f}s.")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
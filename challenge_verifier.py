@@ -0,0 +1,207 @@
+# challenge_verifier.py
+
+import hashlib
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; only the timeout applies there.
+    resource = None
+
+from quiz_view import parse_quiz
+
+DEFAULT_TIMEOUT_SECONDS = 5
+DEFAULT_MEMORY_MB = 256
+DEFAULT_MAX_WORKERS = 4
+MAX_OUTPUT_CHARS = 2000
+
+# The quiz modes whose templates require Input, Expected Output and Solution parts.
+VERIFIABLE_MODES = ("Concept-by-Concept Code Challenges", "1 Comprehensive Code Challenge")
+
+INPUT_PARTS = ("Input", "Example Input")
+EXPECTED_PARTS = ("Expected Output",)
+SOLUTION_PARTS = ("Solution",)
+
+_CODE_BLOCK = re.compile(r"```[ \t]*([\w+-]*)[ \t]*\n(.*?)```", re.DOTALL)
+_PRINT_CALL = re.compile(r"^[ \t]*print\(", re.MULTILINE)
+_COMMENTED_PRINT = re.compile(r"^[ \t]*#[ \t]*(print\(.*)$", re.MULTILINE)
+
+_results = OrderedDict()
+_results_lock = threading.Lock()
+_MAX_CACHED_RESULTS = 1000
+
+
+def _code_blocks(markdown):
+    return [body for _, body in _CODE_BLOCK.findall(markdown)]
+
+
+def _normalize_output(text):
+    lines = [line.rstrip() for line in text.strip().splitlines()]
+    return "\n".join(lines)
+
+
+def _with_test_call(solution):
+    """
+    The comprehensive template ends its Solution with a commented-out
+    `# print(...)` test line. If the code prints nothing otherwise, that line is
+    re-enabled so the result can be compared with the Expected Output.
+    """
+    if _PRINT_CALL.search(solution):
+        return solution
+    calls = _COMMENTED_PRINT.findall(solution)
+    return "\n".join([solution] + calls) if calls else solution
+
+
+def extract_challenges(text):
+    """
+    Pulls every verifiable challenge out of a quiz: sections that have a
+    Solution and an Expected Output. Returns dicts with the section index, the
+    code to run (Input followed by Solution) and the expected output.
+    """
+    challenges = []
+    for index, section in enumerate(parse_quiz(text)["sections"]):
+        parts = dict(section["parts"])
+        solution = next((parts[p] for p in SOLUTION_PARTS if p in parts), None)
+        expected = next((parts[p] for p in EXPECTED_PARTS if p in parts), None)
+        if solution is None or expected is None:
+            continue
+        solution_code = [_with_test_call(block) for block in _code_blocks(solution)]
+        expected_blocks = _code_blocks(expected)
+        if not solution_code:
+            continue
+        input_code = []
+        for p in INPUT_PARTS:
+            if p in parts:
+                input_code.extend(_code_blocks(parts[p]))
+        challenges.append({
+            "index": index,
+            "code": "\n".join(input_code + solution_code),
+            "expected": expected_blocks[0] if expected_blocks else expected,
+        })
+    return challenges
+
+
+# Applies the limits inside the child and then runs the solution it reads from stdin.
+# (preexec_fn would run them between fork and exec, which can deadlock in a threaded server.)
+_LAUNCHER = """\
+import resource, sys
+cpu_seconds, memory, file_size, processes = map(int, sys.argv[1:5])
+resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+resource.setrlimit(resource.RLIMIT_FSIZE, (file_size, file_size))
+resource.setrlimit(resource.RLIMIT_NPROC, (processes, processes))
+source = sys.stdin.read()
+sys.argv = ["-c"]
+exec(compile(source, "<solution>", "exec"), {"__name__": "__main__"})
+"""
+
+
+def _command(memory_mb, timeout):
+    if resource is None or os.name != "posix":
+        return [sys.executable, "-I", "-"]
+    # RLIMIT_NPROC counts every process of the server's user, so 0 is the only
+    # predictable cap: the solution may not start processes at all.
+    limits = [max(1, int(timeout)), memory_mb * 1024 * 1024, 1024 * 1024, 0]
+    return [sys.executable, "-I", "-c", _LAUNCHER] + [str(limit) for limit in limits]
+
+
+def _kill_process_group(process):
+    if os.name == "posix":
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass  # The group has already exited.
+    else:
+        process.kill()
+    process.wait()
+
+
+def run_solution(code, expected, timeout=DEFAULT_TIMEOUT_SECONDS, memory_mb=DEFAULT_MEMORY_MB):
+    """
+    Runs one solution in a fresh, isolated interpreter (no site-packages from the
+    user, an empty environment, a throwaway working directory, CPU/memory/file
+    size limits where the OS supports them) and compares its stdout with the
+    expected output.
+
+    Returns a dict with a status of "pass", "fail", "error" (exception or
+    timeout, the latter flagged with "timed_out") or "no_output" (the solution
+    prints nothing, e.g. it only defines a function), plus the captured output.
+    """
+    # Output goes to unnamed files rather than pipes, so a process the solution
+    # left behind can't hold the result back by keeping a pipe open.
+    with tempfile.TemporaryDirectory() as workdir, \
+            tempfile.TemporaryFile("w+", encoding="utf-8", errors="replace") as stdout_file, \
+            tempfile.TemporaryFile("w+", encoding="utf-8", errors="replace") as stderr_file:
+        process = subprocess.Popen(
+            _command(memory_mb, timeout),
+            cwd=workdir,
+            env={"PYTHONIOENCODING": "utf-8"},
+            stdin=subprocess.PIPE,
+            stdout=stdout_file,
+            stderr=stderr_file,
+            text=True,
+            # Its own process group, so everything it starts can be killed with it.
+            start_new_session=True,
+        )
+        try:
+            # The code is the child's whole stdin, so input() still sees end-of-file.
+            process.communicate(code, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {"status": "error", "output": "", "error": f"Timed out after {timeout}s", "timed_out": True}
+        finally:
+            _kill_process_group(process)
+        stdout_file.seek(0)
+        stdout = stdout_file.read(MAX_OUTPUT_CHARS)
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+
+    if process.returncode != 0:
+        error_lines = stderr.strip().splitlines()
+        return {"status": "error", "output": stdout, "error": error_lines[-1] if error_lines else f"Exit code {process.returncode}"}
+    if not stdout.strip():
+        return {"status": "no_output", "output": "", "error": None}
+    status = "pass" if _normalize_output(stdout) == _normalize_output(expected) else "fail"
+    return {"status": status, "output": stdout, "error": None}
+
+
+def _cache_key(code, expected):
+    return hashlib.sha256(f"{code}\0{expected}".encode("utf-8")).hexdigest()
+
+
+def verify_challenge(challenge, timeout=DEFAULT_TIMEOUT_SECONDS, memory_mb=DEFAULT_MEMORY_MB):
+    """Runs a challenge, or returns the cached result for identical code and expected output."""
+    key = _cache_key(challenge["code"], challenge["expected"])
+    with _results_lock:
+        if key in _results:
+            _results.move_to_end(key)
+            return _results[key]
+    result = run_solution(challenge["code"], challenge["expected"], timeout, memory_mb)
+    if result.get("timed_out"):
+        # A timeout can come from a busy server rather than the code, so it is tried again next time.
+        return result
+    with _results_lock:
+        _results[key] = result
+        while len(_results) > _MAX_CACHED_RESULTS:
+            _results.popitem(last=False)
+    return result
+
+
+def verify_quiz(text, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT_SECONDS, memory_mb=DEFAULT_MEMORY_MB):
+    """
+    Verifies every challenge in a quiz in parallel. Returns a dict mapping each
+    verified section's index (in parse_quiz order) to its result.
+    """
+    challenges = extract_challenges(text)
+    if not challenges:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(challenges))) as executor:
+        results = executor.map(lambda c: verify_challenge(c, timeout, memory_mb), challenges)
+        return {challenge["index"]: result for challenge, result in zip(challenges, results)}
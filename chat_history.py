@@ -0,0 +1,78 @@
+# chat_history.py
+
+from prompts import estimate_tokens
+
+DEFAULT_HISTORY_TOKEN_BUDGET = 6000
+
+QUIZ_CONTEXT_TEMPLATE = (
+    'Here is the "{quiz_mode}" quiz on "{topic}" that the student is working through. '
+    "Answer their follow-up questions about it."
+)
+SPOKEN_QUESTION_PLACEHOLDER = "[The student asked a spoken follow-up question.]"
+
+
+def _turn_role(turn):
+    return turn["role"] if isinstance(turn, dict) else turn.role
+
+
+def _turn_texts(turn):
+    """Returns the text parts of a history turn; non-text parts (audio) come back as None."""
+    parts = turn["parts"] if isinstance(turn, dict) else turn.parts
+    texts = []
+    for part in parts:
+        if isinstance(part, str):
+            texts.append(part)
+        elif isinstance(part, dict):
+            texts.append(part.get("text"))
+        else:
+            texts.append(getattr(part, "text", None) or None)
+    return texts
+
+
+class ChatHistoryManager:
+    """
+    Keeps the follow-up chat history within a token budget.
+
+    The first exchange is reduced to a one-line description of the quiz plus the
+    rendered quiz itself (the long template instructions are not needed to answer
+    questions about it). Answered audio questions are replaced by a short text
+    placeholder, and the oldest follow-up exchanges are dropped once the history
+    exceeds `token_budget`. The quiz exchange is always kept.
+    """
+
+    def __init__(self, token_budget=DEFAULT_HISTORY_TOKEN_BUDGET):
+        self.token_budget = token_budget
+
+    def seed(self, chat_session, topic, quiz_mode):
+        """Swaps the full quiz prompt at the start of the chat for a compact description."""
+        history = list(chat_session.history)
+        if not history:
+            return
+        compact = [{"role": "user", "parts": [QUIZ_CONTEXT_TEMPLATE.format(quiz_mode=quiz_mode, topic=topic)]}]
+        compact.extend(self._as_text_turn(turn) for turn in history[1:])
+        chat_session.history = compact
+
+    def compact(self, chat_session):
+        """Strips answered audio and drops the oldest follow-ups until the history fits the budget."""
+        history = [self._as_text_turn(turn) for turn in chat_session.history]
+        seed, follow_ups = history[:2], history[2:]
+        while follow_ups and self.count_tokens(seed + follow_ups) > self.token_budget:
+            # Follow-ups are question/answer pairs; drop them together.
+            follow_ups = follow_ups[2:]
+        chat_session.history = seed + follow_ups
+
+    def count_tokens(self, history):
+        """Estimated prompt tokens that resending `history` would cost."""
+        return sum(
+            estimate_tokens(text)
+            for turn in history
+            for text in _turn_texts(turn)
+            if text
+        )
+
+    def _as_text_turn(self, turn):
+        texts = _turn_texts(turn)
+        if _turn_role(turn) == "user" and any(text is None for text in texts):
+            # The model's answer already captures what was asked; the audio is not resent.
+            return {"role": "user", "parts": [SPOKEN_QUESTION_PLACEHOLDER]}
+        return {"role": _turn_role(turn), "parts": [text for text in texts if text]}
@@ -0,0 +1,88 @@
+# chunked_review.py
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from library_index import SECTION_SEPARATOR
+from metrics import usage_tokens
+from prompts import build_prompt, estimate_tokens
+
+# Only the per-concept modes can be split; a single capstone challenge has to see everything at once.
+CHUNKABLE_MODES = ("Complete Section Review", "Concept-by-Concept Code Challenges")
+
+DEFAULT_TOKEN_BUDGET = 3000
+DEFAULT_MAX_WORKERS = 4
+
+_HEADING_NUMBER = re.compile(r"^(\s*###\s*)(\d+)\.", re.MULTILINE)
+_TRAILING_RULE = re.compile(r"(\s*---\s*)+$")
+
+
+def group_sections(nodes, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Packs consecutive sections into groups whose source text stays within
+    `token_budget`. Sections are never split, so one oversized section simply
+    becomes a group of its own. Sections without content are skipped.
+    """
+    groups = []
+    current, current_tokens = [], 0
+    for node in nodes:
+        if not node.content:
+            continue
+        tokens = estimate_tokens(node.content)
+        if current and current_tokens + tokens > token_budget:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(node)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def merge_results(texts):
+    """Joins partial reviews in order, renumbering their `### N.` headings continuously."""
+    counter = 0
+
+    def renumber(match):
+        nonlocal counter
+        counter += 1
+        return f"{match.group(1)}{counter}."
+
+    parts = []
+    for text in texts:
+        text = _TRAILING_RULE.sub("", text.strip())
+        if text:
+            parts.append(_HEADING_NUMBER.sub(renumber, text))
+    return "\n\n---\n\n".join(parts)
+
+
+def generate_chunked_review(model, nodes, quiz_mode, difficulty,
+                            token_budget=DEFAULT_TOKEN_BUDGET, max_workers=DEFAULT_MAX_WORKERS, usage=None,
+                            generate=None):
+    """
+    Map-reduce generation for large comprehensive reviews: each token-budgeted
+    group of sections is sent as its own request on a bounded thread pool, and the
+    answers are merged back in section order. Wall-clock time is then close to
+    that of the slowest group rather than the whole chapter.
+
+    If a `usage` dict is given, it receives the summed prompt and response token
+    counts reported for the parts. `generate(prompt)` replaces the direct
+    `model.generate_content` call, e.g. to route parts through a scheduler.
+    """
+    groups = group_sections(nodes, token_budget)
+    prompts = [
+        build_prompt(quiz_mode, difficulty, SECTION_SEPARATOR.join(n.content for n in group))
+        for group in groups
+    ]
+    if not prompts:
+        return ""
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(prompts))) as executor:
+        # map() preserves submission order, which is the section order.
+        responses = list(executor.map(generate or model.generate_content, prompts))
+
+    if usage is not None:
+        counts = [usage_tokens(response) for response in responses]
+        usage["prompt_tokens"] = sum(prompt or 0 for prompt, _ in counts)
+        usage["response_tokens"] = sum(candidates or 0 for _, candidates in counts)
+    return merge_results([response.text for response in responses])
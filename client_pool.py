@@ -0,0 +1,64 @@
+# client_pool.py
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+from google.api_core.client_options import ClientOptions
+
+from prompts import MODEL_NAME
+
+
+def hash_api_key(api_key):
+    """The pool never keeps raw keys as dictionary keys."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class ModelClientPool:
+    """
+    A bounded, process-wide pool of Gemini service clients, one per API key.
+
+    `genai.configure` sets process-global state, so with several sessions
+    generating at once one user's key could be picked up by another user's
+    request. Each pooled client carries its own key instead, and reusing it keeps
+    the underlying connection warm across clicks. Least recently used clients are
+    dropped once more than `max_clients` keys are live.
+    """
+
+    def __init__(self, max_clients=64):
+        self.max_clients = max_clients
+        self.created = 0
+        self.reused = 0
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_client(self, api_key):
+        key = hash_api_key(api_key)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.reused += 1
+                return client
+
+            client = glm.GenerativeServiceClient(client_options=ClientOptions(api_key=api_key))
+            self._clients[key] = client
+            self.created += 1
+            while len(self._clients) > self.max_clients:
+                # Sessions still holding a model keep their client alive; the pool just forgets it.
+                self._clients.popitem(last=False)
+            return client
+
+    def get_model(self, api_key, model_name=MODEL_NAME):
+        """Returns a GenerativeModel bound to the pooled client for this key."""
+        model = genai.GenerativeModel(model_name)
+        # GenerativeModel falls back to the global, configure()-based client when this is unset.
+        model._client = self.get_client(api_key)
+        return model
+
+    def stats(self):
+        with self._lock:
+            live = len(self._clients)
+        return {"live": live, "created": self.created, "reused": self.reused}
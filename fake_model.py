@@ -0,0 +1,115 @@
+# fake_model.py
+
+import asyncio
+import hashlib
+import time
+from types import SimpleNamespace
+
+from prompts import estimate_tokens
+
+
+def _content_text(content):
+    """Flattens a prompt (a string or a list of parts) to the text the fake 'reads'."""
+    if isinstance(content, str):
+        return content
+    texts = []
+    for item in content:
+        if isinstance(item, str):
+            texts.append(item)
+        elif isinstance(item, dict) and "parts" in item:
+            texts.append(_content_text(item["parts"]))
+        elif isinstance(item, dict) and item.get("text"):
+            texts.append(item["text"])
+    return " ".join(texts)
+
+
+class FakeResponse:
+    """Mimics the parts of a Gemini response the app reads."""
+
+    def __init__(self, text, prompt_tokens=0):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=estimate_tokens(text),
+        )
+
+
+class FakeStreamResponse(FakeResponse):
+    """A streamed response: iterating yields chunks, `.text` holds the full reply."""
+
+    def __init__(self, text, prompt_tokens=0, chunk_chars=200):
+        super().__init__(text, prompt_tokens)
+        self.chunk_chars = chunk_chars
+
+    def __iter__(self):
+        for i in range(0, len(self.text), self.chunk_chars):
+            yield FakeResponse(self.text[i:i + self.chunk_chars])
+
+
+class FakeChatSession:
+    """A chat session whose history is a plain list of {"role", "parts"} dicts."""
+
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream=False, **kwargs):
+        parts = [content] if isinstance(content, str) else list(content)
+        prompt_tokens = estimate_tokens(_content_text(self.history) + _content_text(parts))
+        response = self.model.generate_content(parts, stream=stream, prompt_tokens=prompt_tokens)
+        self.history.append({"role": "user", "parts": parts})
+        self.history.append({"role": "model", "parts": [response.text]})
+        return response
+
+
+class FakeModelClient:
+    """
+    A local, deterministic stand-in for `genai.GenerativeModel`, so tools and
+    benchmarks can run without a network connection or an API key.
+
+    Every call waits `latency` seconds and answers with a quiz-shaped response
+    of roughly `response_chars` characters derived from the prompt.
+    `failures` makes the first N calls raise, to exercise retry paths.
+    """
+
+    def __init__(self, latency=0.0, response_chars=2000, failures=0):
+        self.latency = latency
+        self.response_chars = response_chars
+        self.failures = failures
+        self.calls = 0
+
+    def _respond(self, prompt):
+        self.calls += 1
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("429 Resource has been exhausted (fake)")
+
+        seed = hashlib.sha256(_content_text(prompt).encode("utf-8")).hexdigest()[:12]
+        sections = []
+        number = 1
+        while sum(len(s) for s in sections) < self.response_chars:
+            sections.append(
+                f"### {number}. Concept {seed}-{number}\n\n"
+                f"**Definition:** A deterministic placeholder definition for concept {number}.\n\n"
+                f"**Example:**\n```python\nprint({number})\n```\n"
+            )
+            number += 1
+        return "\n---\n\n".join(sections)
+
+    def generate_content(self, prompt, stream=False, prompt_tokens=None, **kwargs):
+        if prompt_tokens is None:
+            prompt_tokens = estimate_tokens(_content_text(prompt))
+        # Like the real client, a streamed call only returns once its first chunk has arrived.
+        if self.latency:
+            time.sleep(self.latency)
+        if stream:
+            return FakeStreamResponse(self._respond(prompt), prompt_tokens)
+        return FakeResponse(self._respond(prompt), prompt_tokens)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return FakeResponse(self._respond(prompt), estimate_tokens(_content_text(prompt)))
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, history)
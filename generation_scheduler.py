@@ -0,0 +1,185 @@
+# generation_scheduler.py
+
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from prompts import estimate_tokens
+
+# Added to each prompt's estimate so the budget also covers the tokens generated in reply.
+RESPONSE_TOKEN_ALLOWANCE = 2000
+
+
+def is_rate_limit_error(error):
+    """Recognises provider rate limiting (HTTP 429 / gRPC RESOURCE_EXHAUSTED) without importing api_core."""
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    if getattr(error, "code", None) == 429:
+        return True
+    message = str(error)
+    return "429" in message or "Resource has been exhausted" in message
+
+
+def estimate_request_tokens(prompt):
+    return estimate_tokens(prompt) + RESPONSE_TOKEN_ALLOWANCE
+
+
+class TokenBucket:
+    """A tokens-per-minute budget that refills continuously."""
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = tokens_per_minute
+        self.available = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.capacity / 60.0)
+        self._updated = now
+
+    def acquire(self, tokens):
+        # A single request larger than the whole budget waits for a full bucket instead of forever.
+        tokens = min(tokens, self.capacity)
+        with self._condition:
+            while True:
+                self._refill()
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                wait = (tokens - self.available) * 60.0 / self.capacity
+                self._condition.wait(timeout=wait)
+
+
+class GenerationScheduler:
+    """
+    A process-wide gate in front of every model call.
+
+    Identical requests in flight at the same moment (same `key`, e.g. the same
+    rendered prompt) are coalesced: the first caller makes the upstream call and
+    everyone else waits for and shares its result, or makes their own call if
+    it fails. Distinct requests queue for
+    one of `max_concurrency` slots and for room in a tokens-per-minute budget,
+    and calls that hit provider rate limits are retried with exponential backoff
+    before the error is surfaced.
+    """
+
+    def __init__(self, max_concurrency=4, tokens_per_minute=1_000_000, max_retries=4, base_delay=2.0):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(tokens_per_minute)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self._total_wait = 0.0
+
+    def queue_depth(self):
+        with self._lock:
+            return self.waiting
+
+    def run(self, key, fn, estimated_tokens=0):
+        """
+        Runs `fn()` (which makes the upstream call) under the scheduler and
+        returns `(result, ticket)`. The ticket reports whether the call was
+        coalesced, how many callers shared its result ("followers"), how long it
+        queued and how many rate-limit retries it took.
+        Pass `key=None` for requests that can never be shared, such as audio.
+        """
+        leader = True
+        if key is not None:
+            with self._lock:
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = Future()
+                    flight.followers = 0
+                else:
+                    leader = False
+                    flight.followers += 1
+                    self.coalesced += 1
+            if not leader:
+                start = time.perf_counter()
+                try:
+                    result = flight.result()
+                except Exception:
+                    # The leader's failure may be its own (an invalid or exhausted API
+                    # key), so make this caller's request rather than sharing the error.
+                    with self._lock:
+                        self.coalesced -= 1
+                    return self.run(None, fn, estimated_tokens)
+                return result, {"coalesced": True, "queue_s": time.perf_counter() - start, "retries": 0, "followers": 0}
+        else:
+            flight = None
+
+        try:
+            queue_s = self._acquire(estimated_tokens)
+            try:
+                result, retries = self._call_with_backoff(fn)
+            finally:
+                self._release()
+        except BaseException as e:
+            if flight is not None:
+                flight.set_exception(e)
+                self._forget(key)
+            raise
+        followers = 0
+        if flight is not None:
+            flight.set_result(result)
+            self._forget(key)
+            with self._lock:
+                followers = flight.followers
+        return result, {"coalesced": False, "queue_s": queue_s, "retries": retries, "followers": followers}
+
+    def _forget(self, key):
+        with self._lock:
+            self._flights.pop(key, None)
+
+    def _acquire(self, estimated_tokens):
+        start = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+        try:
+            self._slots.acquire()
+            self._bucket.acquire(estimated_tokens)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.running += 1
+            self._total_wait += waited
+        return waited
+
+    def _release(self):
+        with self._lock:
+            self.running -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def _call_with_backoff(self, fn):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn(), attempt
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    self.rate_limited += 1
+                time.sleep(self.base_delay * (2 ** attempt) * (1 + random.random()))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "waiting": self.waiting,
+                "running": self.running,
+                "completed": self.completed,
+                "coalesced": self.coalesced,
+                "rate_limited": self.rate_limited,
+                "avg_wait_s": self._total_wait / self.completed if self.completed else 0.0,
+            }
@@ -0,0 +1,409 @@
+# ingest_tutorial.py
+"""
+Builds python_tutorial_library.json from the reStructuredText sources of the
+Python tutorial (Doc/tutorial in a CPython checkout), one record per section
+with the same topic numbering, levels and content format the app expects.
+
+Examples:
+    python ingest_tutorial.py ~/cpython/Doc/tutorial
+    python ingest_tutorial.py ~/cpython/Doc/tutorial --dry-run
+    python ingest_tutorial.py ~/cpython/Doc/tutorial --force --workers 8
+    python ingest_tutorial.py ~/cpython-3.12/Doc/tutorial --output python_3_12_tutorial.json
+
+Runs are incremental: a manifest records a hash of every source file and every
+section, only files that changed since the last run are parsed again (in a
+process pool), the sections of unchanged files are carried over as they are,
+and nothing is written when no section changed. The result is also converted
+into an indexed library store (see library_store.py) for the app to serve.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from library_store import DEFAULT_LIBRARY_DIR, ensure_store
+
+DEFAULT_LIBRARY_PATH = "python_tutorial_library.json"
+
+_ADORNMENT = re.compile(r"^([!-/:-@\[-`{-~])\1{2,}\s*$")
+_DIRECTIVE = re.compile(r"^\.\.\s+([\w:-]+)::\s*(.*)$")
+CODE_DIRECTIVES = ("code-block", "sourcecode", "code", "doctest", "testcode")
+# Admonition-like directives whose body is part of the prose; every other directive is skipped.
+TEXT_DIRECTIVES = ("note", "warning", "seealso", "tip", "important", "hint", "caution", "attention",
+                   "versionadded", "versionchanged", "deprecated", "impl-detail", "admonition")
+
+_ROLE = re.compile(r":[\w:.+-]+:`([^`]*)`")
+_LINK = re.compile(r"`([^`<]*?)\s*<([^>]*)>`__?")
+_NAMED_REF = re.compile(r"`([^`]+)`__?")
+_LITERAL = re.compile(r"``(.+?)``")
+_INTERPRETED = re.compile(r"`([^`]+)`")
+_STRONG = re.compile(r"\*\*(\S(?:.*?\S)?)\*\*")
+_EMPHASIS = re.compile(r"(?<![\w*])\*(\S(?:[^*]*?\S)?)\*(?![\w*])")
+_FOOTNOTE_REF = re.compile(r"\s*\[(?:#\w*|\d+)\]_")
+
+
+def _role_text(target):
+    # :func:`print`, :ref:`Text <label>`, :meth:`~str.join` -> print, Text, join
+    if target.endswith(">") and "<" in target:
+        text = target[:target.rindex("<")].strip()
+        if text:
+            return text
+        target = target[target.rindex("<") + 1:-1]
+    if target.startswith("~"):
+        return target[1:].rsplit(".", 1)[-1]
+    return target.lstrip("!")
+
+
+def inline_text(text):
+    """Strips reST inline markup down to the plain text a reader would see."""
+    text = _FOOTNOTE_REF.sub("", text)
+    text = _ROLE.sub(lambda m: _role_text(m.group(1)), text)
+    text = _LINK.sub(lambda m: m.group(1) or m.group(2), text)
+    text = _LITERAL.sub(r"\1", text)
+    text = _NAMED_REF.sub(r"\1", text)
+    text = _INTERPRETED.sub(r"\1", text)
+    text = _STRONG.sub(r"\1", text)
+    text = _EMPHASIS.sub(r"\1", text)
+    return text.replace("\\ ", "").replace("\\", "")
+
+
+def _collapse(text):
+    return " ".join(text.split())
+
+
+def _indent(line):
+    return len(line) - len(line.lstrip())
+
+
+def _indented_block(lines, start, min_indent=1):
+    """Returns the lines from `start` indented by at least `min_indent` (blank lines included) and where they end."""
+    end = start
+    while end < len(lines) and (not lines[end].strip() or _indent(lines[end]) >= min_indent):
+        end += 1
+    while end > start and not lines[end - 1].strip():
+        end -= 1
+    return lines[start:end], end
+
+
+def _dedent(lines):
+    indents = [_indent(line) for line in lines if line.strip()]
+    cut = min(indents) if indents else 0
+    return [line[cut:] for line in lines]
+
+
+def body_chunks(lines):
+    """
+    Converts a run of reST body lines into content chunks: prose is flattened to
+    plain text and code (literal blocks, doctest blocks and code directives)
+    becomes ```python ... ``` blocks, all in document order.
+    """
+    chunks = []
+    paragraph = []
+    i = 0
+
+    def flush(literal_follows=False):
+        if not paragraph:
+            return
+        text = "\n".join(paragraph)
+        if literal_follows:
+            # "like::" reads "like:", while "text ::" and a bare "::" lose the marker entirely.
+            text = text[:-2]
+            if text and not text[-1].isspace():
+                text += ":"
+        if text.strip():
+            chunks.append(_collapse(inline_text(text)))
+        paragraph.clear()
+
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        if not stripped:
+            flush()
+            i += 1
+            continue
+
+        if _indent(line) == 0 and (stripped == ".." or stripped.startswith(".. ")):
+            # Explicit markup: directives, comments, targets, footnotes, substitutions.
+            flush()
+            directive = _DIRECTIVE.match(line)
+            block, i = _indented_block(lines, i + 1)
+            name = directive.group(1) if directive else None
+            if name in CODE_DIRECTIVES:
+                code = [l for l in _dedent(block) if not l.startswith(":")]
+                chunks.append(f"```python {_collapse(chr(10).join(code))} ```")
+            elif name in TEXT_DIRECTIVES:
+                argument = directive.group(2)
+                if argument and name not in ("versionadded", "versionchanged", "deprecated", "admonition"):
+                    chunks.append(_collapse(inline_text(argument)))
+                chunks.extend(body_chunks(_dedent(block)))
+            continue
+
+        if _indent(line) > 0:
+            # An indented block that no "::" introduced is a block quote (or a list item body).
+            flush()
+            block, i = _indented_block(lines, i, _indent(line))
+            chunks.extend(body_chunks(_dedent(block)))
+            continue
+
+        if stripped.startswith(">>>") and not paragraph:
+            end = i
+            while end < len(lines) and lines[end].strip():
+                end += 1
+            chunks.append(f"```python {_collapse(chr(10).join(lines[i:end]))} ```")
+            i = end
+            continue
+
+        paragraph.append(line)
+        i += 1
+        if stripped.endswith("::") and (i >= len(lines) or not lines[i].strip()):
+            flush(literal_follows=True)
+            start = i
+            while start < len(lines) and not lines[start].strip():
+                start += 1
+            if start < len(lines) and _indent(lines[start]) > 0:
+                block, i = _indented_block(lines, start, _indent(lines[start]))
+                chunks.append(f"```python {_collapse(chr(10).join(_dedent(block)))} ```")
+    flush()
+    return chunks
+
+
+def split_sections(text):
+    """
+    Splits a reST document at its section titles. Returns (level, title, body
+    lines) tuples; levels follow the order in which title styles first appear,
+    as in docutils, so the document title is level 1.
+    """
+    lines = text.splitlines()
+    styles = []
+    sections = []
+    body = None
+    i = 0
+    while i < len(lines):
+        heading = None
+        overline = _ADORNMENT.match(lines[i])
+        if (overline and i + 2 < len(lines) and lines[i + 1].strip()
+                and _ADORNMENT.match(lines[i + 2]) and lines[i + 2].strip()[0] == overline.group(1)):
+            heading = ((overline.group(1), True), lines[i + 1].strip(), i + 3)
+        elif (lines[i].strip() and _indent(lines[i]) == 0 and not _ADORNMENT.match(lines[i])
+                and i + 1 < len(lines) and _ADORNMENT.match(lines[i + 1])
+                and len(lines[i + 1].strip()) >= len(lines[i].strip())
+                and (i == 0 or not lines[i - 1].strip())):
+            heading = ((lines[i + 1].strip()[0], False), lines[i].strip(), i + 2)
+
+        if heading is None:
+            if body is not None:
+                body.append(lines[i])
+            i += 1
+            continue
+        style, title, i = heading
+        if style not in styles:
+            styles.append(style)
+        body = []
+        sections.append((styles.index(style) + 1, inline_text(title).strip(), body))
+    return sections
+
+
+def parse_source(path, chapter):
+    """
+    Parses one tutorial file into library records numbered under `chapter`.
+    Runs in a worker process, so it only takes and returns plain data.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    records = []
+    counters = []
+    for level, title, body in split_sections(raw.decode("utf-8")):
+        if level == 1:
+            counters = [chapter]
+            topic = f"{chapter}. {title}"
+        else:
+            counters = (counters + [0] * level)[:level]
+            counters[level - 1] += 1
+            topic = f"{'.'.join(str(n) for n in counters)} {title}"
+        records.append({
+            "topic": topic,
+            "content": " ".join(body_chunks(body)),
+            "source_file": os.path.basename(path),
+            "level": level,
+        })
+    return {"sha256": hashlib.sha256(raw).hexdigest(), "records": records}
+
+
+def read_toctree(index_path):
+    """Returns the document names listed in the first toctree of `index_path`, in order."""
+    with open(index_path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    for i, line in enumerate(lines):
+        directive = _DIRECTIVE.match(line.strip())
+        if directive and directive.group(1) == "toctree":
+            block, _ = _indented_block(lines, i + 1)
+            names = []
+            for entry in (l.strip() for l in block):
+                if not entry or entry.startswith(":"):
+                    continue
+                if entry.endswith(">") and "<" in entry:
+                    entry = entry[entry.rindex("<") + 1:-1]
+                names.append(entry)
+            return names
+    return []
+
+
+def source_files(source_dir):
+    """The tutorial's files in chapter order: index.rst's toctree, or alphabetical without one."""
+    index_path = os.path.join(source_dir, "index.rst")
+    if os.path.exists(index_path):
+        names = [name if name.endswith(".rst") else f"{name}.rst" for name in read_toctree(index_path)]
+        if names:
+            return [name for name in names if os.path.exists(os.path.join(source_dir, name))]
+    return sorted(os.path.basename(p) for p in glob.glob(os.path.join(source_dir, "*.rst"))
+                  if os.path.basename(p) != "index.rst")
+
+
+def section_hash(record):
+    return hashlib.sha256(json.dumps(record, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _load_json(path, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def _write_json(path, data, indent=2):
+    # Written next to the target and swapped in, so the app never reads half a file.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def manifest_path_for(output):
+    """Each library keeps its own manifest next to it, e.g. python_tutorial_library.manifest.json."""
+    return os.path.splitext(output)[0] + ".manifest.json"
+
+
+def ingest(source_dir, output=DEFAULT_LIBRARY_PATH, manifest_path=None,
+           workers=None, force=False, dry_run=False):
+    """
+    Brings `output` up to date with the sources in `source_dir`. Returns a
+    summary with the files parsed and the sections added, changed and removed.
+    """
+    if manifest_path is None:
+        manifest_path = manifest_path_for(output)
+    names = source_files(source_dir)
+    if not names:
+        raise FileNotFoundError(f"No .rst files found in {source_dir}")
+
+    manifest = _load_json(manifest_path, {}).get("files", {})
+    previous = {}
+    for record in _load_json(output, []):
+        previous.setdefault(record.get("source_file"), []).append(record)
+
+    results = {}
+    to_parse = []
+    for chapter, name in enumerate(names, start=1):
+        entry = manifest.get(name)
+        unchanged = (
+            not force and entry is not None and name in previous
+            and entry["chapter"] == chapter
+            and entry["sha256"] == _file_hash(os.path.join(source_dir, name))
+        )
+        if unchanged:
+            results[name] = {"sha256": entry["sha256"], "records": previous[name]}
+        else:
+            to_parse.append((name, chapter))
+
+    paths = [os.path.join(source_dir, name) for name, _ in to_parse]
+    chapters = [chapter for _, chapter in to_parse]
+    if len(to_parse) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(parse_source, paths, chapters))
+    else:
+        # A single changed file is quicker to parse here than to ship to a worker.
+        parsed = [parse_source(path, chapter) for path, chapter in zip(paths, chapters)]
+    results.update(zip((name for name, _ in to_parse), parsed))
+
+    library = []
+    new_manifest = {}
+    for chapter, name in enumerate(names, start=1):
+        records = results[name]["records"]
+        library.extend(records)
+        new_manifest[name] = {
+            "sha256": results[name]["sha256"],
+            "chapter": chapter,
+            "sections": {record["topic"]: section_hash(record) for record in records},
+        }
+
+    old_sections = {topic: h for entry in manifest.values() for topic, h in entry.get("sections", {}).items()}
+    new_sections = {topic: h for entry in new_manifest.values() for topic, h in entry["sections"].items()}
+    summary = {
+        "files": len(names),
+        "parsed": [name for name, _ in to_parse],
+        "added": sorted(set(new_sections) - set(old_sections)),
+        "changed": sorted(t for t in new_sections if t in old_sections and new_sections[t] != old_sections[t]),
+        "removed": sorted(set(old_sections) - set(new_sections)),
+        "sections": len(library),
+        "written": False,
+    }
+    stale = summary["added"] or summary["changed"] or summary["removed"] or not os.path.exists(output)
+    if stale and not dry_run:
+        _write_json(output, library)
+        _write_json(manifest_path, {"source_dir": os.path.abspath(source_dir), "files": new_manifest})
+        summary["written"] = True
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the tutorial library for The Python Sage from .rst sources.")
+    parser.add_argument("source_dir", help="Directory with the tutorial's .rst files, e.g. cpython/Doc/tutorial.")
+    parser.add_argument("--output", default=DEFAULT_LIBRARY_PATH)
+    parser.add_argument("--manifest", help="Default: the output's name with a .manifest.json extension.")
+    parser.add_argument("--store-dir", default=DEFAULT_LIBRARY_DIR, help="Where the app's library stores live.")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: one per CPU).")
+    parser.add_argument("--force", action="store_true", help="Parse every file, ignoring the manifest.")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    try:
+        summary = ingest(args.source_dir, args.output, args.manifest, args.workers, args.force, args.dry_run)
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if not args.dry_run:
+        ensure_store(args.output, args.store_dir)
+    for label in ("added", "changed", "removed"):
+        for topic in summary[label]:
+            print(f"{label:>8}: {topic}")
+    if summary["written"]:
+        action = "Wrote"
+    elif args.dry_run and (summary["added"] or summary["changed"] or summary["removed"]):
+        action = "Would write"
+    else:
+        action = "Up to date:"
+    print(
+        f"{action} {summary['sections']} sections from {summary['files']} files "
+        f"({len(summary['parsed'])} parsed, {len(summary['added'])} added, {len(summary['changed'])} changed, "
+        f"{len(summary['removed'])} removed) in {time.perf_counter() - start:.2f}s."
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+# library_index.py
+
+from dataclasses import dataclass, field
+
+SECTION_SEPARATOR = "\n---\n"
+
+
+def parse_section_path(topic):
+    """
+    Turns the numeric prefix of a topic title into a tuple path, e.g.
+    "4.9.3 Special parameters" -> (4, 9, 3) and "1. Whetting Your Appetite" -> (1,).
+    Returns None for titles without a numeric prefix.
+    """
+    number = topic.split(" ", 1)[0].rstrip(".")
+    try:
+        return tuple(int(part) for part in number.split("."))
+    except ValueError:
+        return None
+
+
+@dataclass
+class SectionNode:
+    """A single tutorial section together with everything nested beneath it."""
+    path: tuple
+    topic: str
+    level: int
+    children: list = field(default_factory=list)
+    # Filled in once the whole tree is built: where the section's own text and its
+    # whole subtree's text sit in the library text, and how to read them.
+    subtree_topics: list = field(default_factory=list)
+    start: int = 0
+    end: int = 0
+    subtree_end: int = 0
+    read: object = field(default=None, repr=False, compare=False)
+
+    @property
+    def content(self):
+        return self.read(self.start, self.end)
+
+    @property
+    def comprehensive_content(self):
+        return self.read(self.start, self.subtree_end)
+
+    @property
+    def comprehensive_size(self):
+        return self.subtree_end - self.start
+
+
+class SectionIndex:
+    """
+    A section tree over the tutorial library, built once.
+
+    Nodes are reachable in O(1) both by topic title and by numeric section path.
+    All section text is laid out in tree order with SECTION_SEPARATOR between
+    sections, so every subtree is one contiguous span and the comprehensive
+    prompt is a single slice rather than something re-assembled on a rerun.
+
+    `library_data` is the list of records from the JSON library. If `read` is
+    given, records carry `start`/`end` offsets instead of `content` and text is
+    fetched on demand with `read(start, end)`, as a LibraryStore provides.
+    """
+
+    def __init__(self, library_data, read=None):
+        self.by_path = {}
+        self.by_topic = {}
+        self.roots = []
+
+        contents = {}
+        for item in library_data:
+            path = parse_section_path(item['topic'])
+            node = SectionNode(
+                path=path,
+                topic=item['topic'],
+                level=item.get('level', len(path) if path else 1),
+            )
+            if read is None:
+                contents[node.topic] = item['content']
+            else:
+                node.start, node.end = item['start'], item['end']
+            self.by_topic[node.topic] = node
+            if path is None:
+                self.roots.append(node)
+                continue
+            self.by_path[path] = node
+            parent = self._find_parent(path)
+            if parent is None:
+                self.roots.append(node)
+            else:
+                parent.children.append(node)
+
+        if read is None:
+            parts = []
+            offset = 0
+            for node in self.tree_order():
+                parts.append(contents[node.topic])
+                node.start, node.end = offset, offset + len(parts[-1])
+                offset = node.end + len(SECTION_SEPARATOR)
+            text = SECTION_SEPARATOR.join(parts)
+            read = lambda start, end: text[start:end]
+
+        for root in self.roots:
+            self._finalize(root, read)
+
+    def _find_parent(self, path):
+        # Walk upwards so a missing intermediate section does not orphan its children.
+        for depth in range(len(path) - 1, 0, -1):
+            parent = self.by_path.get(path[:depth])
+            if parent is not None:
+                return parent
+        return None
+
+    def _finalize(self, node, read):
+        node.read = read
+        node.subtree_topics = [node.topic]
+        node.subtree_end = node.end
+        for child in node.children:
+            self._finalize(child, read)
+            node.subtree_topics.extend(child.subtree_topics)
+            node.subtree_end = child.subtree_end
+
+    def tree_order(self):
+        """Every node, each followed by its descendants (document order for a well-formed library)."""
+        nodes = []
+        stack = list(reversed(self.roots))
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(reversed(node.children))
+        return nodes
+
+    def get(self, topic):
+        return self.by_topic.get(topic)
+
+    def get_by_path(self, path):
+        return self.by_path.get(path)
+
+    def subtree(self, topic):
+        """Returns the node for `topic` followed by all of its descendants, in document order."""
+        node = self.by_topic.get(topic)
+        if node is None:
+            return []
+        return [self.by_topic[t] for t in node.subtree_topics]
+
+    def content_for(self, topic, comprehensive=False):
+        """Returns the prompt content for a topic, optionally including its whole subtree."""
+        node = self.by_topic.get(topic)
+        if node is None:
+            return ""
+        return node.comprehensive_content if comprehensive else node.content
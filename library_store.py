@@ -0,0 +1,103 @@
+# library_store.py
+
+import glob
+import json
+import mmap
+import os
+import struct
+
+from library_index import SECTION_SEPARATOR, SectionIndex
+
+STORE_EXTENSION = ".sagelib"
+DEFAULT_LIBRARY_DIR = os.environ.get("PYTHON_SAGE_LIBRARY_DIR", "libraries")
+
+_MAGIC = b"SAGELIB1"
+# Magic, then the byte length of the JSON index that follows; the section text comes after it.
+_HEADER = struct.Struct("<8sQ")
+
+
+def corpus_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def write_store(library_data, path):
+    """
+    Writes a library (the records of a JSON library) as a store file: a small
+    JSON index of titles, levels and byte offsets, followed by every section's
+    UTF-8 text in tree order with SECTION_SEPARATOR in between, so each subtree
+    is one contiguous byte range.
+    """
+    tree = SectionIndex(library_data)
+    source_files = {item['topic']: item.get('source_file') for item in library_data}
+    separator = SECTION_SEPARATOR.encode("utf-8")
+    sections, texts = [], []
+    offset = 0
+    for node in tree.tree_order():
+        text = node.content.encode("utf-8")
+        sections.append({
+            "topic": node.topic,
+            "level": node.level,
+            "source_file": source_files.get(node.topic),
+            "start": offset,
+            "end": offset + len(text),
+        })
+        texts.append(text)
+        offset += len(text) + len(separator)
+    index = json.dumps({"sections": sections}, ensure_ascii=False).encode("utf-8")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(index)))
+        f.write(index)
+        f.write(separator.join(texts))
+    # Swapped in whole, so a running app never maps half a file.
+    os.replace(tmp_path, path)
+
+
+def ensure_store(json_path, directory=DEFAULT_LIBRARY_DIR):
+    """
+    Converts a JSON library into a store in `directory`, unless a store at
+    least as new as the JSON file is already there. Returns the store's path,
+    or None if the JSON file does not exist.
+    """
+    if not os.path.exists(json_path):
+        return None
+    store_path = os.path.join(directory, corpus_name(json_path) + STORE_EXTENSION)
+    if not os.path.exists(store_path) or os.path.getmtime(store_path) < os.path.getmtime(json_path):
+        os.makedirs(directory, exist_ok=True)
+        with open(json_path, "r", encoding="utf-8") as f:
+            write_store(json.load(f), store_path)
+    return store_path
+
+
+def list_stores(directory=DEFAULT_LIBRARY_DIR):
+    """Maps each corpus name to its store file in `directory`, sorted by name."""
+    paths = sorted(glob.glob(os.path.join(directory, f"*{STORE_EXTENSION}")))
+    return {corpus_name(path): path for path in paths}
+
+
+class LibraryStore:
+    """
+    A read-only library backed by a store file.
+
+    Opening parses only the index (titles, levels and offsets); section text
+    stays in the memory-mapped file and is decoded when a prompt needs it, so
+    start-up time and resident memory do not grow with the corpus' text.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.name = corpus_name(path)
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a library store.")
+        self._base = _HEADER.size + index_length
+        self.sections = json.loads(self._map[_HEADER.size:self._base])["sections"]
+
+    def read(self, start, end):
+        return self._map[self._base + start:self._base + end].decode("utf-8")
+
+    def section_index(self):
+        return SectionIndex(self.sections, read=self.read)
@@ -0,0 +1,158 @@
+# metrics.py
+
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+DEFAULT_METRICS_DIR = os.environ.get("PYTHON_SAGE_METRICS_DIR", ".metrics")
+
+# Fields every event may carry; missing ones are recorded as None.
+EVENT_FIELDS = (
+    "kind", "mode", "difficulty", "comprehensive", "source",
+    "prompt_chars", "prompt_tokens", "response_tokens", "audio_bytes",
+    "content_ms", "queue_s", "ttfb_s", "total_s", "render_ms", "retries", "error",
+)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers (q between 0 and 100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def usage_tokens(response):
+    """Prompt and response token counts from a Gemini response, when it reports them."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None, None
+    return getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None)
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+class MetricsRecorder:
+    """
+    Collects one event per quiz generation or follow-up.
+
+    Every event is appended to `metrics.jsonl`, and `metrics.prom` is rewritten
+    in the Prometheus text format (for a node_exporter textfile collector or any
+    scraper pointed at the file). The last `max_events` events are also kept in
+    memory for the sidebar diagnostics panel.
+    """
+
+    def __init__(self, directory=DEFAULT_METRICS_DIR, max_events=1000):
+        self.directory = directory
+        self.jsonl_path = os.path.join(directory, "metrics.jsonl")
+        self.prom_path = os.path.join(directory, "metrics.prom")
+        self.events = deque(maxlen=max_events)
+        self._counters = defaultdict(float)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, **fields):
+        event = {"ts": time.time()}
+        event.update({name: fields.get(name) for name in EVENT_FIELDS})
+        with self._lock:
+            self.events.append(event)
+            labels = self._labels(event)
+            self._counters[("requests", labels)] += 1
+            if event["error"]:
+                self._counters[("errors", labels)] += 1
+            self._counters[("retries", labels)] += event["retries"] or 0
+            self._counters[("prompt_tokens", labels)] += event["prompt_tokens"] or 0
+            self._counters[("response_tokens", labels)] += event["response_tokens"] or 0
+            self._counters[("audio_bytes", labels)] += event["audio_bytes"] or 0
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event) + "\n")
+            self._write_prometheus()
+        return event
+
+    @staticmethod
+    def _labels(event):
+        return (event["kind"], event["mode"] or "", event["difficulty"] or "")
+
+    def summary(self):
+        """Per (kind, mode, difficulty) request counts, p50/p95 latency and token spend."""
+        groups = defaultdict(list)
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            groups[self._labels(event)].append(event)
+
+        rows = []
+        for (kind, mode, difficulty), group in sorted(groups.items()):
+            latencies = [e["total_s"] for e in group if e["total_s"] is not None]
+            ttfbs = [e["ttfb_s"] for e in group if e["ttfb_s"] is not None]
+            rows.append({
+                "kind": kind,
+                "mode": mode,
+                "difficulty": difficulty,
+                "requests": len(group),
+                "errors": sum(1 for e in group if e["error"]),
+                "p50_s": percentile(latencies, 50),
+                "p95_s": percentile(latencies, 95),
+                "p50_ttfb_s": percentile(ttfbs, 50),
+                "prompt_tokens": sum(e["prompt_tokens"] or 0 for e in group),
+                "response_tokens": sum(e["response_tokens"] or 0 for e in group),
+            })
+        return rows
+
+    def prometheus_text(self):
+        with self._lock:
+            return self._prometheus_text()
+
+    def _prometheus_text(self):
+        lines = []
+        counter_names = {
+            "requests": "Generation requests",
+            "errors": "Failed generation requests",
+            "retries": "Retries after transient errors",
+            "prompt_tokens": "Prompt tokens sent",
+            "response_tokens": "Response tokens received",
+            "audio_bytes": "Audio bytes uploaded",
+        }
+        for name, help_text in counter_names.items():
+            metric = f"python_sage_{name}_total"
+            lines.append(f"# HELP {metric} {help_text}.")
+            lines.append(f"# TYPE {metric} counter")
+            for (counter, labels), value in sorted(self._counters.items()):
+                if counter == name:
+                    lines.append(f"{metric}{{{self._format_labels(labels)}}} {value:g}")
+
+        for metric, field_name, help_text in (
+            ("python_sage_latency_seconds", "total_s", "Total generation latency"),
+            ("python_sage_ttfb_seconds", "ttfb_s", "Time to first byte of the response"),
+        ):
+            lines.append(f"# HELP {metric} {help_text}.")
+            lines.append(f"# TYPE {metric} summary")
+            groups = defaultdict(list)
+            for event in self.events:
+                if event[field_name] is not None:
+                    groups[self._labels(event)].append(event[field_name])
+            for labels, values in sorted(groups.items()):
+                base = self._format_labels(labels)
+                for q in (50, 95):
+                    lines.append(f'{metric}{{{base},quantile="{q / 100}"}} {percentile(values, q):.6f}')
+                lines.append(f"{metric}_sum{{{base}}} {sum(values):.6f}")
+                lines.append(f"{metric}_count{{{base}}} {len(values)}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _format_labels(labels):
+        kind, mode, difficulty = labels
+        return f'kind="{_label_value(kind)}",mode="{_label_value(mode)}",difficulty="{_label_value(difficulty)}"'
+
+    def _write_prometheus(self):
+        # Write-then-rename so a scraper never reads a half-written file.
+        tmp_path = self.prom_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self._prometheus_text())
+        os.replace(tmp_path, self.prom_path)
@@ -0,0 +1,130 @@
+# prefetch.py
+
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from metrics import usage_tokens
+
+
+def make_prefetch_key(corpus, topic, quiz_mode, difficulty, comprehensive):
+    return (corpus, topic, quiz_mode, difficulty, bool(comprehensive))
+
+
+class PrefetchJob:
+    """A speculative generation for one sidebar selection, held in a session's slot."""
+
+    def __init__(self, key, prompt, future):
+        self.key = key
+        self.prompt = prompt
+        self.future = future
+
+
+class Prefetcher:
+    """
+    Generates the quiz for the current sidebar selection in the background, so a
+    matching "Generate" click can return immediately.
+
+    One process-wide pool of `max_workers` threads serves every session, and no
+    more than `max_pending` jobs may be queued or running at once; beyond that,
+    new prefetches are simply skipped. Jobs whose selection changes before they
+    are used are cancelled if they have not started, otherwise their tokens are
+    counted as wasted (unless another request shared the result while it ran).
+    """
+
+    def __init__(self, max_workers=2, max_pending=8):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.submitted = 0
+        self.skipped = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.wasted_tokens = 0
+
+    def submit(self, key, prompt, generate):
+        """
+        Starts `generate()` in the background, or returns None if the pool is
+        saturated. `generate()` returns a model response and a scheduler ticket,
+        as GenerationScheduler.run does.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.skipped += 1
+                return None
+            self._pending += 1
+            self.submitted += 1
+        future = self._executor.submit(self._generate, generate)
+        future.add_done_callback(self._release)
+        return PrefetchJob(key, prompt, future)
+
+    @staticmethod
+    def _generate(generate):
+        response, ticket = generate()
+        prompt_tokens, response_tokens = usage_tokens(response)
+        return {
+            "text": response.text,
+            "prompt_tokens": prompt_tokens,
+            "response_tokens": response_tokens,
+            # A Generate click for the same prompt may have coalesced onto this call.
+            "shared": ticket.get("followers", 0) > 0,
+        }
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def discard(self, job):
+        """Drops a job whose selection is no longer current."""
+        if job is None:
+            return
+        if job.future.cancel():
+            with self._lock:
+                self.cancelled += 1
+        else:
+            job.future.add_done_callback(self._count_waste)
+
+    def _count_waste(self, future):
+        try:
+            result = future.result()
+        except (CancelledError, Exception):
+            return
+        if result["shared"]:
+            return
+        with self._lock:
+            self.wasted_tokens += (result["prompt_tokens"] or 0) + (result["response_tokens"] or 0)
+
+    def claim(self, job, key):
+        """
+        Returns the prefetched result for `key`, waiting for it if it is still
+        running, or None on a miss (no job, a different selection, or a failure).
+        """
+        if job is None or job.key != key:
+            self.discard(job)
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            result = job.future.result()
+        except Exception:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            claimed = self.hits + self.misses
+            return {
+                "pending": self._pending,
+                "submitted": self.submitted,
+                "skipped": self.skipped,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / claimed if claimed else None,
+                "cancelled": self.cancelled,
+                "wasted_tokens": self.wasted_tokens,
+            }
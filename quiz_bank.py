@@ -0,0 +1,65 @@
+# quiz_bank.py
+
+import gzip
+import json
+import os
+import zlib
+
+DEFAULT_BANK_PATH = "quiz_bank.jsonl.gz"
+
+
+def make_bank_key(topic, quiz_mode, difficulty, comprehensive):
+    return f"{topic}|{quiz_mode}|{difficulty}|{int(bool(comprehensive))}"
+
+
+def append_entry(path, topic, quiz_mode, difficulty, comprehensive, response):
+    """
+    Appends one quiz to the bank. Each entry is written as its own gzip member,
+    so an interrupted run can only cut off the entry it was writing; call
+    `repair_bank` before appending to a bank that `read_quiz_bank` found truncated.
+    """
+    record = {
+        "key": make_bank_key(topic, quiz_mode, difficulty, comprehensive),
+        "response": response,
+    }
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def read_quiz_bank(path=DEFAULT_BANK_PATH):
+    """
+    Returns a dict of bank key -> quiz text (empty if there is no bank yet) and
+    whether the file ended in a truncated entry.
+    """
+    bank = {}
+    if not os.path.exists(path):
+        return bank, False
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                bank[record["key"]] = record["response"]
+    except (EOFError, gzip.BadGzipFile, zlib.error):
+        # A run killed mid-write leaves a truncated last member; keep everything before it.
+        return bank, True
+    return bank, False
+
+
+def load_quiz_bank(path=DEFAULT_BANK_PATH):
+    """Returns a dict of bank key -> quiz text, or an empty dict if there is no bank yet."""
+    return read_quiz_bank(path)[0]
+
+
+def repair_bank(path, bank):
+    """
+    Rewrites the bank from the entries `read_quiz_bank` recovered. Reading stops
+    at a truncated member, so anything appended after one would never be seen.
+    """
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for key, response in bank.items():
+            f.write(json.dumps({"key": key, "response": response}, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
@@ -0,0 +1,160 @@
+# quiz_cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "PYTHON_SAGE_CACHE_PATH", os.path.join(".cache", "quiz_cache.sqlite3")
+)
+
+
+def make_cache_key(model_name, prompt):
+    """Hashes the rendered prompt together with the model name."""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class QuizCache:
+    """
+    A persistent, SQLite-backed store for generated quizzes.
+
+    Entries are evicted least-recently-used first once the cache grows past
+    `max_entries` or `max_bytes`, and any entry older than `max_age_seconds`
+    is treated as a miss and deleted. The file lives on disk, so cached
+    quizzes survive Streamlit restarts.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=500,
+                 max_bytes=50 * 1024 * 1024, max_age_seconds=30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Streamlit serves every session from its own thread, so the single
+        # connection is shared and guarded by the lock above.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS quizzes (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_quizzes_last_access ON quizzes (last_access)"
+        )
+        self._conn.commit()
+
+    def get(self, model_name, prompt):
+        """Returns the cached response text, or None on a miss."""
+        key = make_cache_key(model_name, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM quizzes WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            response, created_at = row
+            if self.max_age_seconds is not None and now - created_at > self.max_age_seconds:
+                self._conn.execute("DELETE FROM quizzes WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE quizzes SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return response
+
+    def contains(self, model_name, prompt):
+        """Checks for an unexpired entry without counting a hit or miss."""
+        key = make_cache_key(model_name, prompt)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at FROM quizzes WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return False
+        return self.max_age_seconds is None or time.time() - row[0] <= self.max_age_seconds
+
+    def put(self, model_name, prompt, response):
+        """Stores a response, replacing any previous entry for the same prompt."""
+        key = make_cache_key(model_name, prompt)
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO quizzes (key, model, response, size, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (key, model_name, response, size, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """Drops expired entries, then the least recently used ones until within limits."""
+        if self.max_age_seconds is not None:
+            self._conn.execute(
+                "DELETE FROM quizzes WHERE created_at < ?", (now - self.max_age_seconds,)
+            )
+
+        count, total_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM quizzes"
+        ).fetchone()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT key, size FROM quizzes ORDER BY last_access ASC"
+        ).fetchall()
+        stale_keys = []
+        for key, size in rows:
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            count -= 1
+            total_bytes -= size
+        self._conn.executemany("DELETE FROM quizzes WHERE key = ?", stale_keys)
+
+    def stats(self):
+        """Returns entry count, stored bytes and the hit/miss counters."""
+        with self._lock:
+            count, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM quizzes"
+            ).fetchone()
+        return {
+            "entries": count,
+            "bytes": total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM quizzes")
+            self._conn.commit()
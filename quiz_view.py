@@ -0,0 +1,147 @@
+# quiz_view.py
+
+import re
+
+import streamlit as st
+
+SECTIONS_PER_PAGE = 5
+# Parts kept out of the page until the learner asks for them.
+HIDDEN_PARTS = ("Solution", "Explanation")
+
+_SECTION_HEADING = re.compile(r"^[ \t]*###[ \t]*(\d+)\.[ \t]*(.*?)[ \t]*$", re.MULTILINE)
+_PART_LABEL = re.compile(r"^[ \t]*\*\*([A-Z][A-Za-z ]{0,30}):\*\*[ \t]*(.*)$")
+_BOLD_TITLE = re.compile(r"^[ \t]*\*\*([^*]+)\*\*[ \t]*$")
+_TRAILING_RULE = re.compile(r"(\s*---\s*)+$")
+
+# Badges for challenge_verifier results, shown in front of a section's title.
+VERIFICATION_BADGES = {"pass": "✅", "fail": "❌", "error": "⚠️", "no_output": "❔"}
+
+
+def _split_parts(body):
+    """
+    Splits a section body on its `**Label:**` lines. Returns the text before the
+    first label and a list of (label, markdown) pairs, in order.
+    """
+    intro, parts = [], []
+    current = None
+    in_code = False
+    for line in body.splitlines():
+        if line.strip().startswith("```"):
+            in_code = not in_code
+        match = None if in_code else _PART_LABEL.match(line)
+        if match:
+            current = [match.group(1).strip(), [match.group(2)] if match.group(2) else []]
+            parts.append(current)
+        elif current is None:
+            intro.append(line)
+        else:
+            current[1].append(line)
+    clean = lambda lines: _TRAILING_RULE.sub("", "\n".join(lines).strip())
+    return clean(intro), [(label, clean(lines)) for label, lines in parts]
+
+
+def parse_quiz(text):
+    """
+    Parses a quiz response into the numbered `### N.` sections that
+    PROMPT_TEMPLATES mandate, each split into its Definition / Task / Input /
+    Expected Output / Solution (etc.) parts. A response without numbered
+    headings, like the single comprehensive challenge, becomes one section
+    titled by its leading bold line.
+    """
+    headings = list(_SECTION_HEADING.finditer(text))
+    sections = []
+    if not headings:
+        intro, parts = _split_parts(text)
+        title_match = _BOLD_TITLE.match(intro.splitlines()[0]) if intro else None
+        title = title_match.group(1).strip() if title_match else ""
+        if title_match:
+            intro = intro.split("\n", 1)[1].strip() if "\n" in intro else ""
+        return {"preamble": "", "sections": [{"number": 1, "title": title, "intro": intro, "parts": parts}]}
+
+    preamble = _TRAILING_RULE.sub("", text[:headings[0].start()].strip())
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+        intro, parts = _split_parts(text[heading.end():end])
+        sections.append({
+            "number": int(heading.group(1)),
+            "title": heading.group(2),
+            "intro": intro,
+            "parts": parts,
+        })
+    return {"preamble": preamble, "sections": sections}
+
+
+def _part_markdown(label, body):
+    # One-line parts stay inline with their label; code blocks and lists go below it.
+    if "\n" in body or body.startswith("```"):
+        return f"**{label}:**\n\n{body}"
+    return f"**{label}:** {body}"
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def parse_quiz_cached(text):
+    # Parsing happens once per quiz; every later rerun is a cache lookup.
+    return parse_quiz(text)
+
+
+def _render_verification(result):
+    if result["status"] == "pass":
+        st.caption("✅ The solution produces the expected output.")
+    elif result["status"] == "no_output":
+        st.caption("❔ The solution printed nothing, so it could not be checked.")
+    elif result["status"] == "fail":
+        st.caption("❌ The solution's output differs from the expected output. It printed:")
+        st.code(result["output"], language="text")
+    else:
+        st.caption(f"⚠️ The solution failed to run: {result['error']}")
+
+
+def render_quiz(text, view_key, verification=None):
+    """
+    Renders a quiz one page of collapsible sections at a time, with solutions
+    only sent to the browser once revealed. `view_key` must be unique per quiz
+    so page and reveal state reset when a new quiz is generated.
+
+    `verification` optionally maps section indexes to challenge_verifier results,
+    which are shown as a badge on the section and a note under its solution.
+    """
+    verification = verification or {}
+    quiz = parse_quiz_cached(text)
+    sections = quiz["sections"]
+    if quiz["preamble"]:
+        st.markdown(quiz["preamble"])
+
+    page_start = 0
+    page_sections = sections
+    if len(sections) > SECTIONS_PER_PAGE:
+        page_starts = list(range(0, len(sections), SECTIONS_PER_PAGE))
+        page_start = st.radio(
+            "Sections",
+            options=page_starts,
+            format_func=lambda start: f"{start + 1}–{min(start + SECTIONS_PER_PAGE, len(sections))}",
+            horizontal=True,
+            key=f"{view_key}_page",
+        )
+        page_sections = sections[page_start:page_start + SECTIONS_PER_PAGE]
+
+    for index, section in enumerate(page_sections, start=page_start):
+        label = f"{section['number']}. {section['title']}" if section["title"] else f"Part {section['number']}"
+        result = verification.get(index)
+        if result:
+            label = f"{VERIFICATION_BADGES[result['status']]} {label}"
+        with st.expander(label, expanded=True):
+            if section["intro"]:
+                st.markdown(section["intro"])
+            hidden = []
+            for part_label, part_body in section["parts"]:
+                if part_label in HIDDEN_PARTS:
+                    hidden.append((part_label, part_body))
+                else:
+                    st.markdown(_part_markdown(part_label, part_body))
+            if hidden:
+                names = " & ".join(part_label for part_label, _ in hidden)
+                if st.toggle(f"Show {names.lower()}", key=f"{view_key}_reveal_{index}"):
+                    for part_label, part_body in hidden:
+                        st.markdown(_part_markdown(part_label, part_body))
+                    if result:
+                        _render_verification(result)
@@ -0,0 +1,35 @@
+# response_streaming.py
+
+import time
+
+
+def stream_response_text(response, timing, start):
+    """
+    Yields the text of each chunk of a streamed Gemini response, for use with
+    `st.write_stream`. Fills `timing` with the time to first token and the total
+    generation time, both in seconds since `start`: a `time.perf_counter()`
+    reading taken just before the model call, since a streamed call only
+    returns once its first chunk has arrived.
+    """
+    timing["ttft"] = None
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks that only carry a finish reason or safety ratings have no text.
+            continue
+        if not text:
+            continue
+        if timing["ttft"] is None:
+            timing["ttft"] = time.perf_counter() - start
+        yield text
+    timing["total"] = time.perf_counter() - start
+
+
+def format_timing(timing):
+    """Renders a timing dict as a short caption."""
+    if not timing:
+        return ""
+    if timing.get("ttft") is None:
+        return f"Generated in {timing.get('total', 0):.1f}s"
+    return f"First token after {timing['ttft']:.1f}s · generated in {timing['total']:.1f}s"
@@ -0,0 +1,225 @@
+# run_benchmarks.py
+"""
+Deterministic, offline benchmarks for The Python Sage's own overhead.
+
+The Gemini model is replaced by the local fake from fake_model.py (configurable
+latency and response size), and the app is driven through Streamlit's testing
+harness, so no API key or network connection is needed.
+
+Examples:
+    python run_benchmarks.py
+    python run_benchmarks.py --latency 0.2 --response-chars 20000 --json bench.json
+    python run_benchmarks.py --baseline bench.json --tolerance 0.25   # exits 1 on regression
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+from unittest import mock
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(ROOT, "app.py")
+LIBRARY_PATH = os.path.join(ROOT, "python_tutorial_library.json")
+
+# A short leaf section, a long leaf section and a whole chapter.
+REPRESENTATIVE_TOPICS = [
+    ("1. Whetting Your Appetite", False),
+    ("3.1.2 Text", False),
+    ("4. More Control Flow Tools", True),
+]
+BENCHMARK_MODES = ["Complete Section Review", "Concept-by-Concept Code Challenges"]
+
+
+def measure(name, fn, repeat, results, subtract_seconds=0.0):
+    """Times `fn` over `repeat` runs, then runs it once more under tracemalloc for peak memory."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start - subtract_seconds)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results.append({
+        "phase": name,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "max_ms": max(timings) * 1000,
+        "peak_kb": peak / 1024,
+    })
+
+
+def make_wav(seconds=2.0, rate=48000):
+    """A stereo test tone padded with silence, like a browser recording."""
+    t = np.arange(int(seconds * rate)) / rate
+    tone = 0.4 * np.sin(2 * np.pi * 220 * t)
+    tone[: rate // 2] = 0
+    tone[-rate // 2:] = 0
+    pcm = (np.stack([tone, tone], axis=1) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def _by_label(widgets, prefix):
+    return next(w for w in widgets if w.label.startswith(prefix))
+
+
+def bench_library(results, repeat):
+    from library_index import SectionIndex
+    from library_store import LibraryStore, write_store
+    from prompts import build_prompt
+
+    def load():
+        with open(LIBRARY_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    measure("load_tutorial_data", load, repeat, results)
+    library_data = load()
+    measure("build_section_index", lambda: SectionIndex(library_data), repeat, results)
+
+    index = SectionIndex(library_data)
+    topics = [topic for topic, _ in REPRESENTATIVE_TOPICS]
+    measure("topic_lookup x1000",
+            lambda: [index.content_for(t, True) for t in topics for _ in range(334)], repeat, results)
+
+    # Kept out of the library directory, which the app would list as a second corpus.
+    store_path = os.path.join(tempfile.mkdtemp(), "benchmark.sagelib")
+    measure("write_library_store", lambda: write_store(library_data, store_path), repeat, results)
+    measure("open_library_store", lambda: LibraryStore(store_path).section_index(), repeat, results)
+    stored_index = LibraryStore(store_path).section_index()
+    measure("stored_topic_lookup x1000",
+            lambda: [stored_index.content_for(t, True) for t in topics for _ in range(334)], repeat, results)
+
+    for topic, comprehensive in REPRESENTATIVE_TOPICS:
+        content = index.content_for(topic, comprehensive)
+        measure(f"prompt_format [{topic[:24]}]",
+                lambda: [build_prompt(m, "Intermediate", content) for m in BENCHMARK_MODES], repeat, results)
+
+
+def bench_app(results, repeat, fake):
+    from streamlit.testing.v1 import AppTest
+
+    def fresh_app():
+        at = AppTest.from_file(APP_PATH, default_timeout=60)
+        at.run()
+        return at
+
+    measure("app_cold_run", fresh_app, 1, results)
+
+    at = fresh_app()
+    measure("app_rerun_idle", at.run, repeat, results)
+
+    at.sidebar.text_input(key="api_key").input("benchmark-key")
+    _by_label(at.sidebar.checkbox, "5. Regenerate anyway").check()
+    at.run()
+
+    for topic, comprehensive in REPRESENTATIVE_TOPICS:
+        for mode in BENCHMARK_MODES:
+            label = f"[{topic[:24]} / {mode[:14]}]"
+            at.sidebar.selectbox(key="selected_topic").select(topic)
+            _by_label(at.sidebar.radio, "2. Select a quiz mode").set_value(mode)
+            _by_label(at.sidebar.checkbox, "4. Make it a Comprehensive Review").set_value(comprehensive)
+            at.run()
+
+            def generate():
+                _by_label(at.sidebar.button, "✨ Generate My Quiz!").click()
+                at.run()
+
+            # Report only the app's own share of the click, not the fake model's wait.
+            measure(f"generate_overhead {label}", generate, repeat, results, subtract_seconds=fake.latency)
+            if at.exception or "last_quiz_response" not in at.session_state:
+                raise RuntimeError(f"Quiz generation failed for {label}: {at.exception}")
+            measure(f"rerun_with_quiz {label}", at.run, repeat, results)
+
+    wav_bytes = make_wav()
+
+    def follow_up():
+        at.audio_input[0].set_value(("question.wav", wav_bytes, "audio/wav"))
+        at.run()
+
+    measure("audio_follow_up", follow_up, repeat, results, subtract_seconds=fake.latency)
+    if at.exception or "follow_up_response" not in at.session_state:
+        raise RuntimeError(f"The follow-up flow did not complete: {at.exception}")
+
+
+def print_table(results):
+    width = max(len(r["phase"]) for r in results)
+    print(f"{'phase':<{width}}  {'mean ms':>9}  {'min ms':>9}  {'max ms':>9}  {'peak KB':>9}")
+    for r in results:
+        print(f"{r['phase']:<{width}}  {r['mean_ms']:9.2f}  {r['min_ms']:9.2f}  {r['max_ms']:9.2f}  {r['peak_kb']:9.1f}")
+
+
+def compare_to_baseline(results, baseline_path, tolerance):
+    """Returns the phases whose mean time regressed by more than `tolerance` (e.g. 0.25 = 25%)."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["phase"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        before = baseline.get(r["phase"])
+        # Sub-millisecond phases are too noisy to gate on.
+        if before and before["mean_ms"] >= 1.0 and r["mean_ms"] > before["mean_ms"] * (1 + tolerance):
+            regressions.append((r["phase"], before["mean_ms"], r["mean_ms"]))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for The Python Sage.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake model latency in seconds.")
+    parser.add_argument("--response-chars", type=int, default=12000, help="Approximate fake response size.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="A previous --json output to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.chdir(ROOT)
+    # Keep benchmark quizzes, metrics and library stores out of the real on-disk ones.
+    scratch_dir = tempfile.mkdtemp()
+    os.environ["PYTHON_SAGE_CACHE_PATH"] = os.path.join(scratch_dir, "quiz_cache.sqlite3")
+    os.environ["PYTHON_SAGE_METRICS_DIR"] = os.path.join(scratch_dir, "metrics")
+    os.environ["PYTHON_SAGE_LIBRARY_DIR"] = os.path.join(scratch_dir, "libraries")
+
+    from client_pool import ModelClientPool
+    from fake_model import FakeModelClient
+
+    fake = FakeModelClient(latency=args.latency, response_chars=args.response_chars)
+    results = []
+    bench_library(results, args.repeat)
+    with mock.patch.object(ModelClientPool, "get_model", lambda self, api_key, model_name=None: fake):
+        bench_app(results, args.repeat, fake)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance)
+        for phase, before, after in regressions:
+            print(f"REGRESSION {phase}: {before:.2f} ms -> {after:.2f} ms", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
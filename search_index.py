@@ -0,0 +1,102 @@
+# search_index.py
+
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from library_index import SECTION_SEPARATOR
+from prompts import estimate_tokens
+
+# A section's title says more about it than any sentence of its body.
+TITLE_WEIGHT = 3
+# The most retrieved text added to a follow-up question.
+DEFAULT_CONTEXT_TOKENS = 1500
+
+# Bare numbers (section numbers, example values) match almost everything, so only words count.
+_TOKEN = re.compile(r"[a-z_][a-z0-9_]*")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+class SearchIndex:
+    """
+    An in-memory BM25 index over the sections of a library, built once.
+
+    Each term's postings are stored as a NumPy array of section ids next to the
+    precomputed BM25 weight of the term in each of those sections, so a query is
+    a handful of vectorised scatter-adds followed by a partial sort. Only the
+    postings are kept: `sections` (SectionNodes, or anything with `topic` and
+    `content`) are read once to build them and again only for `context_for`, so
+    a store-backed library's text stays in its mapped file.
+    """
+
+    def __init__(self, sections, k1=1.5, b=0.75):
+        self.sections = list(sections)
+        self.topics = [section.topic for section in self.sections]
+
+        term_counts = [
+            Counter(tokenize(section.topic) * TITLE_WEIGHT + tokenize(section.content))
+            for section in self.sections
+        ]
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float64)
+        average_length = lengths.mean() if len(lengths) else 0.0
+
+        postings = defaultdict(lambda: ([], []))
+        for doc_id, counts in enumerate(term_counts):
+            for term, count in counts.items():
+                ids, freqs = postings[term]
+                ids.append(doc_id)
+                freqs.append(count)
+
+        size = len(self.topics)
+        self._postings = {}
+        for term, (ids, freqs) in postings.items():
+            ids = np.array(ids, dtype=np.int32)
+            freqs = np.array(freqs, dtype=np.float64)
+            idf = math.log(1 + (size - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = k1 * (1 - b + b * lengths[ids] / average_length)
+            self._postings[term] = (ids, idf * freqs * (k1 + 1) / (freqs + norm))
+
+    def _rank(self, query, limit):
+        scores = np.zeros(len(self.topics))
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is not None:
+                ids, weights = posting
+                # Section ids are unique within a posting list, so fancy-index addition is safe.
+                scores[ids] += weights
+        matches = np.flatnonzero(scores)
+        if len(matches) > limit:
+            matches = matches[np.argpartition(-scores[matches], limit - 1)[:limit]]
+        matches = matches[np.argsort(-scores[matches], kind="stable")]
+        return matches, scores[matches]
+
+    def search(self, query, limit=10):
+        """Returns up to `limit` (topic, score) pairs for `query`, best match first."""
+        matches, scores = self._rank(query, limit)
+        return [(self.topics[i], float(score)) for i, score in zip(matches, scores)]
+
+    def context_for(self, query, limit=3, token_budget=DEFAULT_CONTEXT_TOKENS):
+        """
+        Joins the content of the best-matching sections for `query`, stopping
+        before `token_budget` would be exceeded (the best match is always kept,
+        truncated if necessary). Returns "" when nothing matches.
+        """
+        sections = []
+        used = 0
+        matches, _ = self._rank(query, limit)
+        for i in matches:
+            topic, content = self.topics[i], self.sections[i].content
+            tokens = estimate_tokens(content)
+            if used + tokens > token_budget:
+                if sections:
+                    break
+                content = content[:token_budget * 4]
+                tokens = token_budget
+            sections.append(f"{topic}\n{content}")
+            used += tokens
+        return SECTION_SEPARATOR.join(sections)
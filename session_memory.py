@@ -0,0 +1,161 @@
+# session_memory.py
+
+import io
+import sys
+import threading
+
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from chat_history import ChatHistoryManager
+
+DEFAULT_SESSION_BYTE_BUDGET = 8 * 1024 * 1024
+
+AUDIO_KEY_PREFIX = "audio_recorder_"
+# Bumped to give the audio recorder a fresh key, which discards its recording.
+RECORDER_RESETS_KEY = "recorder_resets"
+QUIZ_VIEW_KEY_PREFIX = "quiz_view_"
+# State that belongs to one quiz and is meaningless once the next one starts.
+QUIZ_STATE_KEYS = (
+    "chat_session",
+    "follow_up_response",
+    "follow_up_timing",
+    "follow_up_token_log",
+    "follow_up_context",
+    "quiz_verification",
+    "last_audio_stats",
+)
+# What an over-budget session gives up, cheapest to lose first (after answered recordings).
+EVICTION_ORDER = ("last_audio_stats", "quiz_verification", "follow_up_token_log", "follow_up_context")
+
+
+def estimate_size(value, _seen=None):
+    """
+    Estimates the bytes held by a session-state value: buffers and strings by
+    their length, containers by their contents, chat sessions by their history.
+    Other objects count only their own shallow size, so shared resources such as
+    the pooled model behind a chat session are never attributed to a session.
+    """
+    seen = _seen if _seen is not None else set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, (str, bytes, bytearray)):
+        return sys.getsizeof(value)
+    if isinstance(value, io.BytesIO):
+        # Covers the UploadedFile held by each audio recorder.
+        with value.getbuffer() as buffer:
+            return buffer.nbytes
+    if isinstance(value, dict):
+        return sum(estimate_size(k, seen) + estimate_size(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sum(estimate_size(item, seen) for item in value)
+    message = getattr(value, "_pb", value)
+    if hasattr(message, "ByteSize"):
+        # A Gemini history turn (a protobuf message), audio included.
+        return message.ByteSize()
+    if hasattr(value, "_history"):
+        # A Gemini ChatSession. Its `history` property raises once a streamed reply
+        # has stopped abnormally, so the turns it has stored are sized instead.
+        return estimate_size(list(value._history), seen)
+    if hasattr(value, "history"):
+        return estimate_size(list(value.history), seen)
+    return sys.getsizeof(value)
+
+
+def current_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+class SessionMemoryManager:
+    """
+    Keeps each session's state within `byte_budget` and tracks what every
+    session holds, for the whole server.
+
+    `start_quiz` frees everything left over from previous quizzes: recorder
+    buffers, the old chat session and its follow-up state, and old quiz view
+    widgets. `enforce`, run at the end of each script run, resets the recorder
+    once its recording has been answered, drops other disposable state and
+    finally trims the follow-up history down to the quiz itself, until the
+    session fits its budget.
+    """
+
+    def __init__(self, byte_budget=DEFAULT_SESSION_BYTE_BUDGET):
+        self.byte_budget = byte_budget
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def start_quiz(self, session_state, quiz_id):
+        """Call before this run renders the recorder or quiz view for the new quiz."""
+        current_view_prefix = f"{QUIZ_VIEW_KEY_PREFIX}{quiz_id}_"
+        for key in list(session_state.keys()):
+            if key.startswith(AUDIO_KEY_PREFIX):
+                del session_state[key]
+            elif key.startswith(QUIZ_VIEW_KEY_PREFIX) and not key.startswith(current_view_prefix):
+                del session_state[key]
+        for key in QUIZ_STATE_KEYS:
+            if key in session_state:
+                del session_state[key]
+
+    def session_sizes(self, session_state):
+        """Estimated bytes per session-state key."""
+        return {key: estimate_size(session_state[key]) for key in list(session_state.keys())}
+
+    def enforce(self, session_state, session_id=None):
+        """
+        Evicts state until the session fits its budget and records its size under
+        `session_id`. Returns the session's size in bytes and the evicted keys.
+        """
+        sizes = self.session_sizes(session_state)
+        total = sum(sizes.values())
+        evicted = []
+        recordings = [key for key in sizes if key.startswith(AUDIO_KEY_PREFIX) and session_state[key] is not None]
+        if total > self.byte_budget and recordings:
+            # A widget rendered in this run can't have its state deleted; moving the
+            # recorder to a new key lets Streamlit drop the recording on the next run.
+            session_state[RECORDER_RESETS_KEY] = session_state.get(RECORDER_RESETS_KEY, 0) + 1
+            total -= sum(sizes.pop(key) for key in recordings)
+            evicted.extend(recordings)
+        for key in EVICTION_ORDER:
+            if total <= self.byte_budget:
+                break
+            if key in sizes:
+                del session_state[key]
+                total -= sizes.pop(key)
+                evicted.append(key)
+        if total > self.byte_budget and "chat_session" in sizes:
+            # Last resort: forget the follow-ups, keeping only the quiz exchange
+            chat_session = session_state["chat_session"]
+            ChatHistoryManager(token_budget=0).compact(chat_session)
+            resized = estimate_size(chat_session)
+            total += resized - sizes["chat_session"]
+            evicted.append("chat_session.history")
+
+        with self._lock:
+            self.evictions += len(evicted)
+            if session_id is not None:
+                self._sessions[session_id] = total
+        return {"bytes": total, "evicted": evicted}
+
+    def _prune(self):
+        # Sessions whose browser tab has closed no longer hold anything.
+        if not runtime.exists():
+            return
+        instance = runtime.get_instance()
+        for session_id in list(self._sessions):
+            if not instance.is_active_session(session_id):
+                del self._sessions[session_id]
+
+    def stats(self):
+        with self._lock:
+            self._prune()
+            sizes = list(self._sessions.values())
+            return {
+                "sessions": len(sizes),
+                "total_bytes": sum(sizes),
+                "max_bytes": max(sizes, default=0),
+                "evictions": self.evictions,
+            }